@@ -0,0 +1,21 @@
+<?php
+// api/cache_version.php
+declare(strict_types=1);
+
+/**
+ * Tell the Telegram bot that data it caches has changed.
+ * The bot polls bot_cache_versions and drops the matching in-process cache.
+ * Never fails the calling request: the bot's cache TTL still bounds staleness.
+ */
+function bump_cache_version(PDO $pdo, string $name): void
+{
+    try {
+        $stmt = $pdo->prepare(
+            'INSERT INTO bot_cache_versions (name, version) VALUES (:name, 1)
+             ON DUPLICATE KEY UPDATE version = version + 1'
+        );
+        $stmt->execute([':name' => $name]);
+    } catch (Throwable $e) {
+        error_log("bump_cache_version({$name}) failed: " . $e->getMessage());
+    }
+}
@@ -14,6 +14,7 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 require_once __DIR__ . '/session_bootstrap.php';
 require_once __DIR__ . '/auth.php';
 require_once __DIR__ . '/dbinfo.php';
+require_once __DIR__ . '/cache_version.php';
 
 auth_require_login(['admin', 'owner']);
 
@@ -206,6 +207,8 @@ try {
     $out->execute([':id' => $id]);
     $row = $out->fetch();
 
+    bump_cache_version($pdo, 'catalog');
+
     echo json_encode(['success' => true, 'row' => $row]);
 } catch (Throwable $e) {
     http_response_code(500);
@@ -18,6 +18,8 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 }
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
+require __DIR__ . '/sales_rollup.php';
 
 try {
     if (!isset($pdo) || !($pdo instanceof PDO)) {
@@ -41,6 +43,11 @@ try {
         exit;
     }
 
+    // The sale's day is needed to refresh the bot's rollup after the delete
+    $dateStmt = $pdo->prepare('SELECT purchased_date FROM sale_overview WHERE sale_id = :id');
+    $dateStmt->execute([':id' => $id]);
+    $purchased_date = $dateStmt->fetchColumn();
+
     $stmt = $pdo->prepare('DELETE FROM sale_overview WHERE sale_id = :id');
     $stmt->execute([':id' => $id]);
 
@@ -50,6 +57,10 @@ try {
         exit;
     }
 
+    if ($purchased_date !== false) {
+        refresh_sales_rollup($pdo, 'retail', [(string)$purchased_date]);
+    }
+    bump_cache_version($pdo, 'sales');
     echo json_encode(['success' => true, 'deleted' => $id]);
 } catch (Throwable $e) {
     http_response_code(500);
@@ -18,6 +18,8 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 }
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
+require __DIR__ . '/sales_rollup.php';
 
 try {
     if (!isset($pdo) || !($pdo instanceof PDO)) {
@@ -173,6 +175,8 @@ try {
     ]);
 
     $id = (int)$pdo->lastInsertId();
+    refresh_sales_rollup($pdo, 'retail', [$purchased_date]);
+    bump_cache_version($pdo, 'sales');
     http_response_code(201);
     echo json_encode(['success' => true, 'id' => $id]);
 } catch (Throwable $e) {
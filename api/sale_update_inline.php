@@ -53,6 +53,7 @@ try {
 
     // DB bootstrap (your file defines $pdo)
     require_once __DIR__ . '/dbinfo.php';
+    require_once __DIR__ . '/cache_version.php';
     if (!isset($pdo) || !($pdo instanceof PDO)) {
         json_fail('Database connection not available.', 500);
     }
@@ -136,6 +137,7 @@ try {
         }
         // unchanged → still OK
     }
+    bump_cache_version($pdo, 'sales');
 
     json_ok([
         'id'    => $id,
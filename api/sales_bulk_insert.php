@@ -18,6 +18,8 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 }
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
+require __DIR__ . '/sales_rollup.php';
 
 try {
     // Read JSON input
@@ -131,6 +133,8 @@ try {
     }
 
     $pdo->commit();
+    refresh_sales_rollup($pdo, 'retail', array_column($sales, 'purchased_date'));
+    bump_cache_version($pdo, 'sales');
 
     echo json_encode([
         'success' => true,
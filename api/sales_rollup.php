@@ -0,0 +1,40 @@
+<?php
+// api/sales_rollup.php
+declare(strict_types=1);
+
+/**
+ * Recompute the Telegram bot's sales_daily_rollup rows for the given days
+ * after a sale insert or delete, so /summary sees dashboard changes at once.
+ * Never fails the calling request: the bot's periodic reconcile repairs the rollup.
+ */
+function refresh_sales_rollup(PDO $pdo, string $saleType, array $dates): void
+{
+    $table = $saleType === 'wholesale' ? 'ws_sale_overview' : 'sale_overview';
+    $dates = array_unique(array_filter($dates, 'is_string'));
+
+    try {
+        $delete = $pdo->prepare(
+            'DELETE FROM sales_daily_rollup WHERE sale_date = :sale_date AND sale_type = :sale_type'
+        );
+        $insert = $pdo->prepare(
+            "INSERT INTO sales_daily_rollup (sale_date, sale_type, total_sales, total_profit, order_count)
+             SELECT purchased_date, :sale_type, SUM(price), SUM(profit), COUNT(*)
+             FROM {$table}
+             WHERE purchased_date = :sale_date
+             GROUP BY purchased_date"
+        );
+
+        foreach ($dates as $date) {
+            $params = [':sale_date' => $date, ':sale_type' => $saleType];
+            $pdo->beginTransaction();
+            $delete->execute($params);
+            $insert->execute($params);
+            $pdo->commit();
+        }
+    } catch (Throwable $e) {
+        if ($pdo->inTransaction()) {
+            $pdo->rollBack();
+        }
+        error_log("refresh_sales_rollup({$saleType}) failed: " . $e->getMessage());
+    }
+}
@@ -14,6 +14,7 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 require_once __DIR__ . '/session_bootstrap.php';
 require_once __DIR__ . '/auth.php';
 require_once __DIR__ . '/dbinfo.php';
+require_once __DIR__ . '/cache_version.php';
 
 auth_require_login(['admin', 'owner']);
 
@@ -58,6 +59,8 @@ try {
         exit;
     }
 
+    bump_cache_version($pdo, 'catalog');
+
     echo json_encode(['success' => true]);
 } catch (Throwable $e) {
     http_response_code(500);
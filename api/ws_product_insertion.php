@@ -13,6 +13,7 @@ if ($_SERVER['REQUEST_METHOD'] !== 'POST') {
 require_once __DIR__ . '/session_bootstrap.php';
 require_once __DIR__ . '/auth.php';
 require_once __DIR__ . '/dbinfo.php';
+require_once __DIR__ . '/cache_version.php';
 
 auth_require_login(['admin', 'owner']);
 
@@ -132,6 +133,8 @@ try {
     $id = (int)$pdo->lastInsertId();
 
     http_response_code(201);
+    bump_cache_version($pdo, 'catalog');
+
     echo json_encode(['success' => true, 'id' => $id]);
 } catch (Throwable $e) {
     http_response_code(500);
@@ -11,6 +11,8 @@ header('Content-Type: application/json; charset=utf-8');
 header('X-Content-Type-Options: nosniff');
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
+require __DIR__ . '/sales_rollup.php';
 
 try {
     if (!isset($pdo) || !($pdo instanceof PDO)) {
@@ -34,10 +36,11 @@ try {
     $sale_id = (int)$data['id'];
 
     // Check if sale exists
-    $checkStmt = $pdo->prepare("SELECT sale_id FROM ws_sale_overview WHERE sale_id = ?");
+    $checkStmt = $pdo->prepare("SELECT purchased_date FROM ws_sale_overview WHERE sale_id = ?");
     $checkStmt->execute([$sale_id]);
+    $existing = $checkStmt->fetch(PDO::FETCH_ASSOC);
 
-    if (!$checkStmt->fetch()) {
+    if (!$existing) {
         throw new RuntimeException('Sale not found');
     }
 
@@ -48,6 +51,8 @@ try {
     if ($deleteStmt->rowCount() === 0) {
         throw new RuntimeException('Failed to delete sale');
     }
+    refresh_sales_rollup($pdo, 'wholesale', [(string)$existing['purchased_date']]);
+    bump_cache_version($pdo, 'sales');
 
     echo json_encode([
         'success' => true,
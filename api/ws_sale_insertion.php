@@ -11,6 +11,8 @@ header('Content-Type: application/json; charset=utf-8');
 header('X-Content-Type-Options: nosniff');
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
+require __DIR__ . '/sales_rollup.php';
 
 try {
     if (!isset($pdo) || !($pdo instanceof PDO)) {
@@ -121,6 +123,8 @@ try {
     ]);
 
     $sale_id = $pdo->lastInsertId();
+    refresh_sales_rollup($pdo, 'wholesale', [$purchased_date]);
+    bump_cache_version($pdo, 'sales');
 
     echo json_encode([
         'success' => true,
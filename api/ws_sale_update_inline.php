@@ -11,6 +11,7 @@ header('Content-Type: application/json; charset=utf-8');
 header('X-Content-Type-Options: nosniff');
 
 require __DIR__ . '/dbinfo.php';
+require __DIR__ . '/cache_version.php';
 
 try {
     if (!isset($pdo) || !($pdo instanceof PDO)) {
@@ -71,6 +72,7 @@ try {
     if ($updateStmt->rowCount() === 0) {
         throw new RuntimeException('No changes made to sale');
     }
+    bump_cache_version($pdo, 'sales');
 
     echo json_encode([
         'success' => true,
@@ -0,0 +1,19 @@
+-- ===============================================
+-- BOT CACHE VERSIONS
+-- ===============================================
+-- The Telegram bot keeps in-process caches of rarely changing data.
+-- The PHP API bumps a row here after every write (api/cache_version.php)
+-- and the bot polls this table to drop stale entries without a restart.
+-- ===============================================
+CREATE TABLE IF NOT EXISTS bot_cache_versions (
+    name VARCHAR(64) NOT NULL PRIMARY KEY,
+    version BIGINT UNSIGNED NOT NULL DEFAULT 0,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP ON UPDATE CURRENT_TIMESTAMP
+);
+
+-- Product catalogs (products_catalog, ws_products_catalog)
+INSERT IGNORE INTO bot_cache_versions (name, version) VALUES ('catalog', 0);
+
+-- Sale tables (sale_overview, ws_sale_overview): drops the bot's same-day
+-- expiring/renewals snapshot
+INSERT IGNORE INTO bot_cache_versions (name, version) VALUES ('sales', 0);
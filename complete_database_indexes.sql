@@ -21,6 +21,9 @@ CREATE INDEX idx_ws_sale_overview_expired_renew ON ws_sale_overview(expired_date
 -- Composite indexes for ORDER BY optimization
 CREATE INDEX idx_sale_overview_purchased_sale_id ON sale_overview(purchased_date DESC, sale_id DESC);
 CREATE INDEX idx_ws_sale_overview_purchased_sale_id ON ws_sale_overview(purchased_date DESC, sale_id DESC);
+-- Composite indexes for the bot's today's sales list (ORDER BY price DESC)
+CREATE INDEX idx_sale_overview_purchased_price ON sale_overview(purchased_date, price);
+CREATE INDEX idx_ws_sale_overview_purchased_price ON ws_sale_overview(purchased_date, price);
 -- Index for MONTH() function optimization (sales_table.php, ws_sales_table.php)
 -- Note: This helps with WHERE MONTH(purchased_date) = :month queries
 CREATE INDEX idx_sale_overview_purchased_month ON sale_overview(purchased_date);
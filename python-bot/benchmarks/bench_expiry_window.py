@@ -0,0 +1,80 @@
+"""Regression benchmark for the expiring-products query.
+
+Seeds the scratch database at growing history sizes (constant sales per
+day, so the number of rows in the expiry window stays roughly the same)
+and times the full-history scan the bot used to run against the indexed
+window query in get_expiring_soon_products. Exits non-zero when the
+window query slows down by more than --max-growth between the smallest
+and largest history, i.e. when it stops being a range scan.
+
+    python benchmarks/bench_expiry_window.py --sizes 10000 100000 300000
+"""
+import argparse
+import asyncio
+import sys
+
+from common import (
+    bot, connect_bench_db, install_bench_pool, recreate_sale_tables,
+    seed_history, time_call,
+)
+
+# The pre-window query: every subscription ever sold, filtered in Python
+LEGACY_EXPIRING_QUERY = f"""
+    SELECT {bot.SaleType.RETAIL:d} as sale_type, {bot.SALE_ROW_COLUMNS}
+    FROM sale_overview
+    WHERE expired_date IS NOT NULL
+    UNION ALL
+    SELECT {bot.SaleType.WHOLESALE:d} as sale_type, {bot.SALE_ROW_COLUMNS}
+    FROM ws_sale_overview
+    WHERE expired_date IS NOT NULL
+    ORDER BY expired_date ASC
+"""
+
+
+async def legacy_expiring():
+    rows = await bot.execute_query(LEGACY_EXPIRING_QUERY)
+    return bot.process_expiring_data(bot.sale_rows(rows))
+
+
+async def window_expiring():
+    rows = await bot.get_expiring_soon_products()
+    return bot.process_expiring_data(rows)
+
+
+async def run(sizes, repeats, max_growth):
+    conn = connect_bench_db()
+    install_bench_pool()
+    today = bot.get_bangkok_today()
+
+    print(f"{'rows/table':>12} {'legacy ms':>10} {'window ms':>10} {'shown':>6}")
+    window_timings = []
+    for size in sizes:
+        recreate_sale_tables(conn)
+        seed_history(conn, size, today)
+
+        legacy_s, legacy_rows = await time_call(legacy_expiring, repeats)
+        window_s, window_rows = await time_call(window_expiring, repeats)
+        if len(legacy_rows) != len(window_rows):
+            print(f"Result mismatch at {size} rows: {len(legacy_rows)} vs {len(window_rows)}")
+            return 1
+
+        window_timings.append(window_s)
+        print(f"{size:>12} {legacy_s * 1000:>10.2f} {window_s * 1000:>10.2f} {len(window_rows):>6}")
+
+    conn.close()
+    growth = window_timings[-1] / window_timings[0]
+    print(f"Window query growth {sizes[0]} -> {sizes[-1]} rows: {growth:.2f}x")
+    return 0 if growth <= max_growth else 1
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000])
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--max-growth", type=float, default=3.0)
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(sorted(args.sizes), args.repeats, args.max_growth)))
+
+
+if __name__ == '__main__':
+    main()
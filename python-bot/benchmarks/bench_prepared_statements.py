@@ -0,0 +1,77 @@
+"""Micro-benchmark for the prepared statement cache on the hot query paths.
+
+Times check_user_auth, fetch_product_details, get_summary_data and
+save_sale against the scratch database, once with queries sent as text
+(PREPARED_STATEMENTS off) and once through the per-connection prepared
+statement cache, and prints the median latency per call. Bot-side caches
+are bypassed so every call reaches MySQL.
+
+    python benchmarks/bench_prepared_statements.py --repeats 1000
+"""
+import argparse
+import asyncio
+
+from common import (
+    bot, connect_bench_db, install_bench_pool, recreate_hot_tables,
+    recreate_sale_tables, time_call,
+)
+
+
+def hot_paths(today):
+    sale = {
+        'sale_product': 'Product 1', 'duration': 1, 'renew': 0, 'customer': 'Bench',
+        'email': 'bench@example.com', 'purchased_date': today, 'expired_date': None,
+        'manager': 'Aung', 'note': '', 'price': 15000, 'profit': 3000,
+        'product_type': 'retail', 'quantity': 1,
+    }
+
+    async def auth():
+        return await bot.check_user_auth(100000007, refresh=True)
+
+    async def product():
+        bot.catalog_cache.clear()
+        return await bot.fetch_product_details('R-7')
+
+    async def summary():
+        return await bot.get_summary_data(today)
+
+    async def insert():
+        return await bot.save_sale(dict(sale))
+
+    return [("check_user_auth", auth), ("fetch_product_details", product),
+            ("get_summary_data", summary), ("save_sale", insert)]
+
+
+async def run(repeats):
+    conn = connect_bench_db()
+    recreate_sale_tables(conn)
+    recreate_hot_tables(conn)
+    conn.close()
+    pool = install_bench_pool()
+    bot.WRITE_BEHIND = False
+
+    today = bot.get_bangkok_today().strftime('%Y-%m-%d')
+    print(f"{'query':>22} {'text us':>9} {'prepared us':>12} {'gain':>6}")
+    for name, func in hot_paths(today):
+        timings = {}
+        for prepared in (False, True):
+            bot.PREPARED_STATEMENTS = prepared
+            await time_call(func, 20)  # warm up connections and statements
+            timings[prepared], _ = await time_call(func, repeats)
+        gain = timings[False] / timings[True] if timings[True] else 0
+        print(f"{name:>22} {timings[False] * 1e6:>9.1f} {timings[True] * 1e6:>12.1f} {gain:>5.2f}x")
+
+    stats = pool.stats()
+    print(f"statements cached {stats['statements_cached']}, hits {stats['statement_hits']}, "
+          f"prepares {stats['statement_prepares']}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=500)
+    args = parser.parse_args()
+    asyncio.run(run(args.repeats))
+
+
+if __name__ == '__main__':
+    main()
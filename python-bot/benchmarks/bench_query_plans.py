@@ -0,0 +1,83 @@
+"""EXPLAIN check for the per-table sale queries the bot merges itself.
+
+Seeds the scratch database, then runs EXPLAIN on every branch of the
+expiring scan, the renewal candidate scans, today's sales and the keyset
+pages (first page, forward and backward from a cursor). Prints the index
+each branch reads and exits non-zero if any plan needs a filesort or a
+temporary table, i.e. if a branch no longer comes back in index order.
+
+    python benchmarks/bench_query_plans.py --rows 100000
+"""
+import argparse
+import sys
+from datetime import timedelta
+
+from common import bot, connect_bench_db, recreate_sale_tables, seed_history
+
+UNSORTED_PLAN = ("Using filesort", "Using temporary")
+
+
+def plan_cases(today):
+    """(label, [(query, params), ...]) for every per-table query family"""
+    today_str = today.strftime('%Y-%m-%d')
+    window = (today_str, (today + timedelta(days=bot.EXPIRING_HORIZON_DAYS)).strftime('%Y-%m-%d'))
+    renewal_filter, renewal_params = bot.renewal_candidate_filter(today)
+    cursor = (today_str, bot.SaleType.RETAIL, 1)
+
+    cases = [
+        ("expiring", bot.expiring_soon_queries(anchor_date=today)),
+        ("renewals", bot.renewals_scan_queries(today)),
+        ("today_sales", bot.today_sales_queries(today_str)),
+    ]
+    for label, columns, where, params in (
+        ("expiring_page", "customer, email, purchased_date, expired_date",
+         "expired_date BETWEEN %s AND %s", window),
+        ("renewals_page", "customer, email, purchased_date, expired_date, duration, renew",
+         renewal_filter, renewal_params),
+    ):
+        cases.append((f"{label} first", bot.sale_keyset_queries(columns, where, params, limit=11)))
+        cases.append((f"{label} next", bot.sale_keyset_queries(columns, where, params, cursor, limit=11)))
+        cases.append((f"{label} prev", bot.sale_keyset_queries(columns, where, params, cursor, True, limit=11)))
+    return cases
+
+
+def explain(conn, query, params):
+    cursor = conn.cursor(dictionary=True)
+    cursor.execute("EXPLAIN " + query, params)
+    plan = cursor.fetchall()
+    cursor.close()
+    return plan
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000, help="sales per sale table")
+    args = parser.parse_args()
+
+    conn = connect_bench_db()
+    today = bot.get_bangkok_today()
+    recreate_sale_tables(conn)
+    seed_history(conn, args.rows, today)
+    cursor = conn.cursor()
+    cursor.execute("ANALYZE TABLE sale_overview, ws_sale_overview")
+    cursor.fetchall()
+    cursor.close()
+
+    failures = 0
+    print(f"{'query':<22} {'table':<18} {'key':<36} {'rows':>8}  extra")
+    for label, branches in plan_cases(today):
+        for query, params in branches:
+            for step in explain(conn, query, params):
+                extra = step.get('Extra') or ''
+                bad = any(flag in extra for flag in UNSORTED_PLAN)
+                failures += bad
+                print(f"{label:<22} {step['table'] or '':<18} {step['key'] or '-':<36} "
+                      f"{step['rows'] or 0:>8}  {extra}{'  <-- not in index order' if bad else ''}")
+    conn.close()
+
+    print(f"{failures} plan(s) with a filesort or temporary table")
+    sys.exit(1 if failures else 0)
+
+
+if __name__ == '__main__':
+    main()
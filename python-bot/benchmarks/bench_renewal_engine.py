@@ -0,0 +1,59 @@
+"""Micro-benchmark for calculate_next_due_date.
+
+Times the closed-form engine in eraverse_dashboard against the
+step-by-step loop it replaced on old and new subscriptions. No database
+is needed; tests/test_renewal_engine.py checks that both agree.
+
+    python benchmarks/bench_renewal_engine.py
+"""
+import argparse
+import time
+from datetime import date, datetime, timedelta
+
+from common import bot
+
+
+def calculate_next_due_date_iterative(purchased_date, renew_months, base_date):
+    """The original loop: one renew period at a time from purchased_date"""
+    due_date = purchased_date
+    while due_date < base_date:
+        year = due_date.year
+        month = due_date.month + renew_months
+        day = due_date.day
+        while month > 12:
+            year += 1
+            month -= 12
+        try:
+            due_date = due_date.replace(year=year, month=month, day=day)
+        except ValueError:
+            if month == 12:
+                next_month = datetime(year + 1, 1, 1)
+            else:
+                next_month = datetime(year, month + 1, 1)
+            due_date = (next_month - timedelta(days=1)).date()
+    return due_date
+
+
+def time_engine(func, purchased, renew, base, repeats):
+    started = time.perf_counter()
+    for _ in range(repeats):
+        func(purchased, renew, base)
+    return (time.perf_counter() - started) / repeats * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--repeats", type=int, default=2000)
+    args = parser.parse_args()
+
+    base = date(2025, 6, 15)
+    print(f"{'purchased':>12} {'renew':>6} {'loop us':>9} {'closed us':>10}")
+    for purchased in (date(2025, 5, 31), date(2020, 1, 31), date(2010, 1, 31)):
+        for renew in (1, 3):
+            loop_us = time_engine(calculate_next_due_date_iterative, purchased, renew, base, args.repeats)
+            closed_us = time_engine(bot.calculate_next_due_date, purchased, renew, base, args.repeats)
+            print(f"{purchased.isoformat():>12} {renew:>6} {loop_us:>9.2f} {closed_us:>10.2f}")
+
+
+if __name__ == '__main__':
+    main()
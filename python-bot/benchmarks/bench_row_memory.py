@@ -0,0 +1,144 @@
+"""Memory benchmark for the sale rows behind the expiry and renewal scans.
+
+Builds the same synthetic result set two ways: as the dict rows the
+dictionary cursor used to return (prefixed product name and sale_type
+string in every row, days_left and a re-formatted expired_date added
+afterwards) and as SaleRow objects built from plain cursor tuples. Values
+are decoded per row the way the connector does, so no strings are shared
+between rows. Reports retained and peak bytes per row from tracemalloc
+and the time to build and process each form. No database is needed.
+
+    python benchmarks/bench_row_memory.py --rows 100000
+"""
+import argparse
+import gc
+import random
+import time
+import tracemalloc
+from datetime import date, timedelta
+
+from common import bot
+
+EXPIRING_COLUMNS = ("sale_product", "customer", "email", "purchased_date", "expired_date", "sale_type")
+RENEWAL_COLUMNS = EXPIRING_COLUMNS[:5] + ("duration", "renew", "sale_type")
+
+
+def raw_values(count, today, seed):
+    """Encoded column values per row, as they arrive off the wire"""
+    rng = random.Random(seed)
+    rows = []
+    for sale_id in range(1, count + 1):
+        duration = rng.choice([1, 3, 6, 12])
+        expired = today + timedelta(days=rng.randint(0, bot.EXPIRING_HORIZON_DAYS))
+        rows.append((
+            sale_id,
+            rng.random() < 0.3,
+            f"Product {rng.randint(1, 60)}".encode(),
+            f"Customer {rng.randint(1, 50000)}".encode(),
+            f"user{rng.randint(1, 50000)}@example.com".encode(),
+            (expired - timedelta(days=30 * duration)).toordinal(),
+            expired.toordinal(),
+            duration,
+            rng.choice([0, 1, duration]),
+        ))
+    return rows
+
+
+def legacy_rows(raw, renewal):
+    """Dict rows as the old CONCAT / sale_type-literal queries produced them"""
+    columns = RENEWAL_COLUMNS if renewal else EXPIRING_COLUMNS
+    rows = []
+    for _, wholesale, product, customer, email, purchased, expired, duration, renew in raw:
+        prefix, sale_type = (b"Wholesale - ", b"wholesale") if wholesale else (b"Retail - ", b"retail")
+        values = [
+            (prefix + product).decode(), customer.decode(), email.decode(),
+            date.fromordinal(purchased), date.fromordinal(expired),
+        ]
+        if renewal:
+            values += [duration, renew]
+        values.append(sale_type.decode())
+        rows.append(dict(zip(columns, values)))
+    return rows
+
+
+def compact_rows(raw, renewal):
+    """SaleRow objects from plain cursor tuples, as the scans now build them"""
+    rows = []
+    for sale_id, wholesale, product, customer, email, purchased, expired, duration, renew in raw:
+        values = (
+            int(wholesale), sale_id, product.decode(), customer.decode(), email.decode(),
+            date.fromordinal(purchased), date.fromordinal(expired),
+        )
+        if renewal:
+            values += (duration, renew)
+        rows.append(values)
+    return bot.sale_rows(rows)
+
+
+def legacy_expiring(rows, today):
+    """The old iter_expiring_items: days_left added and expired_date re-formatted in every dict"""
+    soon = []
+    for row in rows:
+        days_left = (row["expired_date"] - today).days
+        if 0 <= days_left <= bot.EXPIRING_HORIZON_DAYS:
+            row["days_left"] = days_left
+            row["expired_date"] = row["expired_date"].strftime("%Y-%m-%d")
+            soon.append(row)
+    return soon
+
+
+def compact_expiring(rows, today):
+    return list(bot.iter_expiring_items(rows, today))
+
+
+def run_scan(build, process, raw, renewal, today):
+    rows = build(raw, renewal)
+    built = time.perf_counter()
+    if not renewal:
+        rows = process(rows, today)
+    return rows, built
+
+
+def measure(build, process, raw, renewal, today):
+    """(retained bytes, peak bytes, build seconds, process seconds) for one row form"""
+    # Timings come from an untraced pass; tracemalloc slows allocation down
+    gc.collect()
+    started = time.perf_counter()
+    rows, built = run_scan(build, process, raw, renewal, today)
+    finished = time.perf_counter()
+    del rows
+
+    gc.collect()
+    tracemalloc.start()
+    rows, _ = run_scan(build, process, raw, renewal, today)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del rows
+    return retained, peak, built - started, finished - built
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--rows", type=int, default=100000)
+    parser.add_argument("--seed", type=int, default=7)
+    args = parser.parse_args()
+
+    today = bot.get_bangkok_today()
+    raw = raw_values(args.rows, today, args.seed)
+
+    print(f"{args.rows} rows")
+    print(f"{'scan':>9} {'form':>8} {'bytes/row':>10} {'peak/row':>9} {'build ms':>9} {'process ms':>11}")
+    for renewal in (False, True):
+        scan = "renewals" if renewal else "expiring"
+        results = {}
+        for form, build, process in (("dict", legacy_rows, legacy_expiring), ("SaleRow", compact_rows, compact_expiring)):
+            retained, peak, build_s, process_s = measure(build, process, raw, renewal, today)
+            results[form] = retained
+            process_text = "-" if renewal else f"{process_s * 1000:.1f}"
+            print(f"{scan:>9} {form:>8} {retained / args.rows:>10.0f} {peak / args.rows:>9.0f} "
+                  f"{build_s * 1000:>9.1f} {process_text:>11}")
+        print(f"{scan:>9} SaleRow holds {results['SaleRow'] / results['dict']:.0%} of the dict form's memory")
+
+
+if __name__ == '__main__':
+    main()
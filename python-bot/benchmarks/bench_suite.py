@@ -0,0 +1,191 @@
+"""Benchmark suite for the bot's data paths on synthetic data.
+
+For each size, rebuilds the scratch database with that many sales per
+sale table (DURATION_MIX / RENEW_MIX subscriptions over --history-days)
+plus both product catalogs. It then times the reads and writes behind
+the bot's commands and writes every measurement to a JSON file. Pass
+--compare with an earlier results file to print the change per
+benchmark. Needs the scratch MySQL/MariaDB described in common.py.
+
+    python benchmarks/bench_suite.py --sizes 10000 100000 1000000 \\
+        --output results/run.json --compare results/baseline.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+
+from common import (
+    BENCH_DB, BOT_DIR, bot, connect_bench_db, install_bench_pool,
+    recreate_hot_tables, recreate_sale_tables, seed_history, time_samples,
+)
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=BOT_DIR,
+            capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        'median_ms': statistics.median(ordered) * 1000,
+        'p95_ms': ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))] * 1000,
+        'min_ms': ordered[0] * 1000,
+        'repeats': len(ordered),
+    }
+
+
+def result_rows(result):
+    if isinstance(result, (list, tuple)):
+        return len(result)
+    return None
+
+
+def suite(today):
+    """(name, callable) pairs; each callable returns something with a length where that makes sense"""
+    today_str = today.strftime('%Y-%m-%d')
+    sale = {
+        'sale_product': 'Product 1', 'duration': 3, 'renew': 1, 'customer': 'Bench',
+        'email': 'bench@example.com', 'purchased_date': today_str, 'expired_date': None,
+        'manager': 'Aung', 'note': '', 'price': 25000, 'profit': 5000,
+        'product_type': 'retail', 'quantity': 1,
+    }
+    state = {}
+
+    async def expiring():
+        state['expiring'] = bot.process_expiring_data(await bot.get_expiring_soon_products())
+        return state['expiring']
+
+    async def renewals():
+        state['renewals'] = await bot.get_renewals_due_soon()
+        return state['renewals']
+
+    async def monthly_summary():
+        return await bot.get_monthly_summary()
+
+    async def today_sales():
+        state['today_sales'] = await bot.get_today_sales_details()
+        return state['today_sales']
+
+    def format_expiring():
+        return bot.format_expiring_message(state['expiring'])
+
+    def format_renewals():
+        return bot.format_renewals_message(state['renewals'])
+
+    def format_sales():
+        return bot.format_sales_details_message(state['today_sales'])
+
+    async def save_sale():
+        return await bot.save_sale(dict(sale))
+
+    return [
+        ("expiring", expiring),
+        ("renewals", renewals),
+        ("monthly_summary", monthly_summary),
+        ("today_sales", today_sales),
+        ("format_expiring_message", format_expiring),
+        ("format_renewals_message", format_renewals),
+        ("format_sales_details_message", format_sales),
+        ("save_sale", save_sale),
+    ]
+
+
+async def run_size(conn, size, args):
+    today = bot.get_bangkok_today()
+    started = time.perf_counter()
+    recreate_sale_tables(conn)
+    recreate_hot_tables(conn, products=args.catalog_rows)
+    seed_history(conn, size, today, history_days=args.history_days)
+    seed_seconds = time.perf_counter() - started
+    print(f"seeded {size} rows/table in {seed_seconds:.1f}s")
+
+    results = []
+    samples, _ = await time_samples(bot.reconcile_sales_rollup, 1)
+    results.append({'size': size, 'benchmark': 'rollup_rebuild', 'rows': None, **summarize(samples)})
+
+    for name, func in suite(today):
+        await time_samples(func, 1)  # warm up the pool and caches
+        samples, result = await time_samples(func, args.repeats)
+        results.append({'size': size, 'benchmark': name, 'rows': result_rows(result), **summarize(samples)})
+    return results
+
+
+def print_results(results, baseline):
+    previous = {(r['size'], r['benchmark']): r for r in baseline.get('results', [])} if baseline else {}
+    header = f"{'size':>9} {'benchmark':<30} {'rows':>7} {'median ms':>10} {'p95 ms':>9}"
+    print(header + (f" {'vs base':>8}" if previous else ""))
+    for r in results:
+        rows = '' if r['rows'] is None else r['rows']
+        line = f"{r['size']:>9} {r['benchmark']:<30} {rows:>7} {r['median_ms']:>10.3f} {r['p95_ms']:>9.3f}"
+        base = previous.get((r['size'], r['benchmark']))
+        if base and base['median_ms']:
+            line += f" {r['median_ms'] / base['median_ms']:>7.2f}x"
+        print(line)
+
+
+async def run(args):
+    baseline = None
+    if args.compare:
+        with open(args.compare) as f:
+            baseline = json.load(f)
+
+    conn = connect_bench_db()
+    install_bench_pool()
+    bot.WRITE_BEHIND = False
+    results = []
+    for size in sorted(args.sizes):
+        results.extend(await run_size(conn, size, args))
+    conn.close()
+
+    report = {
+        'run': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+            'git_revision': git_revision(),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'database': BENCH_DB,
+            'repeats': args.repeats,
+            'history_days': args.history_days,
+            'catalog_rows': args.catalog_rows,
+            'vectorized_batch': bot.VECTORIZED_BATCH,
+            'prepared_statements': bot.PREPARED_STATEMENTS,
+        },
+        'results': results,
+    }
+    output_dir = os.path.dirname(args.output)
+    if output_dir:
+        os.makedirs(output_dir, exist_ok=True)
+    with open(args.output, "w") as f:
+        json.dump(report, f, indent=2)
+
+    print_results(results, baseline)
+    print(f"results written to {args.output}")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[10000, 100000, 1000000])
+    parser.add_argument("--repeats", type=int, default=7)
+    parser.add_argument("--history-days", type=int, default=3 * 365)
+    parser.add_argument("--catalog-rows", type=int, default=500)
+    parser.add_argument("--output", default="bench_results.json")
+    parser.add_argument("--compare", help="earlier results JSON to compare against")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,290 @@
+"""Shared helpers for the bot benchmarks.
+
+Benchmarks run against a scratch MySQL/MariaDB database built from the
+DB_CONFIG in creds.py with the database name swapped for
+ERAVERSE_BENCH_DB (default: eraverse_bench). Never point this at the
+production schema - every run drops and recreates the sale tables.
+"""
+import inspect
+import os
+import random
+import statistics
+import sys
+import time
+from datetime import timedelta
+
+BOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+if BOT_DIR not in sys.path:
+    sys.path.insert(0, BOT_DIR)
+
+import mysql.connector  # noqa: E402
+
+import eraverse_dashboard as bot  # noqa: E402
+from creds import DB_CONFIG  # noqa: E402
+
+BENCH_DB = os.environ.get("ERAVERSE_BENCH_DB", "eraverse_bench")
+
+# (value, weight) mixes observed in the live sale tables: mostly monthly
+# plans, a minority of longer ones, and auto-renew only on multi-month plans
+DURATION_MIX = ((1, 45), (3, 20), (6, 15), (12, 20))
+RENEW_MIX = {1: ((0, 1),), 3: ((0, 70), (1, 25), (3, 5)), 6: ((0, 75), (1, 20), (6, 5)), 12: ((0, 80), (1, 15), (12, 5))}
+
+SALE_TABLE_DDL = {
+    "sale_overview": """
+        CREATE TABLE sale_overview (
+            sale_id INT AUTO_INCREMENT PRIMARY KEY,
+            sale_product VARCHAR(255) NOT NULL,
+            duration INT NOT NULL,
+            renew INT NOT NULL DEFAULT 0,
+            customer VARCHAR(255) NOT NULL,
+            email VARCHAR(255),
+            purchased_date DATE NOT NULL,
+            expired_date DATE,
+            manager VARCHAR(255),
+            note TEXT,
+            price DECIMAL(12, 2) NOT NULL,
+            profit DECIMAL(12, 2) NOT NULL,
+            INDEX idx_sale_overview_purchased_date (purchased_date),
+            INDEX idx_sale_overview_purchased_price (purchased_date, price),
+            INDEX idx_sale_overview_expired_date (expired_date),
+            INDEX idx_sale_overview_renew (renew)
+        )
+    """,
+    "ws_sale_overview": """
+        CREATE TABLE ws_sale_overview (
+            sale_id INT AUTO_INCREMENT PRIMARY KEY,
+            sale_product VARCHAR(255) NOT NULL,
+            duration INT NOT NULL,
+            quantity INT NOT NULL DEFAULT 1,
+            renew INT NOT NULL DEFAULT 0,
+            customer VARCHAR(255) NOT NULL,
+            email VARCHAR(255),
+            purchased_date DATE NOT NULL,
+            expired_date DATE,
+            manager VARCHAR(255),
+            note TEXT,
+            price DECIMAL(12, 2) NOT NULL,
+            profit DECIMAL(12, 2) NOT NULL,
+            INDEX idx_ws_sale_overview_purchased_date (purchased_date),
+            INDEX idx_ws_sale_overview_purchased_price (purchased_date, price),
+            INDEX idx_ws_sale_overview_expired_date (expired_date),
+            INDEX idx_ws_sale_overview_renew (renew)
+        )
+    """,
+}
+
+# Lookup tables behind the bot's hot read paths
+HOT_TABLE_DDL = {
+    "bot_users": """
+        CREATE TABLE bot_users (
+            id INT AUTO_INCREMENT PRIMARY KEY,
+            telegram_id BIGINT NOT NULL UNIQUE,
+            username VARCHAR(255),
+            is_active BOOLEAN NOT NULL DEFAULT TRUE
+        )
+    """,
+    "products_catalog": """
+        CREATE TABLE products_catalog (
+            product_id INT AUTO_INCREMENT PRIMARY KEY,
+            product_name VARCHAR(255) NOT NULL,
+            duration INT NOT NULL,
+            renew INT NOT NULL DEFAULT 0,
+            supplier VARCHAR(255),
+            wholesale DECIMAL(12, 2) NOT NULL,
+            retail DECIMAL(12, 2) NOT NULL,
+            note TEXT,
+            link VARCHAR(255)
+        )
+    """,
+    "ws_products_catalog": """
+        CREATE TABLE ws_products_catalog (
+            product_id INT AUTO_INCREMENT PRIMARY KEY,
+            product_name VARCHAR(255) NOT NULL,
+            duration INT NOT NULL,
+            renew INT NOT NULL DEFAULT 0,
+            supplier VARCHAR(255),
+            wholesale DECIMAL(12, 2) NOT NULL,
+            retail DECIMAL(12, 2) NOT NULL,
+            note TEXT,
+            link VARCHAR(255)
+        )
+    """,
+    "sales_daily_rollup": """
+        CREATE TABLE sales_daily_rollup (
+            sale_date DATE NOT NULL,
+            sale_type ENUM('retail', 'wholesale') NOT NULL,
+            total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            total_profit DECIMAL(14, 2) NOT NULL DEFAULT 0,
+            order_count INT UNSIGNED NOT NULL DEFAULT 0,
+            PRIMARY KEY (sale_date, sale_type)
+        )
+    """,
+}
+
+
+def bench_db_config():
+    """DB_CONFIG pointed at the scratch benchmark database"""
+    config = dict(DB_CONFIG)
+    config["database"] = BENCH_DB
+    return config
+
+
+def connect_bench_db():
+    """Open a direct connection to the benchmark database, creating it if needed"""
+    server_config = {k: v for k, v in DB_CONFIG.items() if k != "database"}
+    conn = mysql.connector.connect(**server_config)
+    cursor = conn.cursor()
+    cursor.execute(f"CREATE DATABASE IF NOT EXISTS `{BENCH_DB}`")
+    cursor.close()
+    conn.database = BENCH_DB
+    return conn
+
+
+def install_bench_pool():
+    """Swap the bot's connection pool for one bound to the benchmark database"""
+    bot.db_pool = bot.DBConnectionPool(bench_db_config())
+    bot.db_pool.warm()
+    return bot.db_pool
+
+
+def recreate_sale_tables(conn):
+    """Drop and recreate both sale tables with the production indexes"""
+    cursor = conn.cursor()
+    for table, ddl in SALE_TABLE_DDL.items():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(ddl)
+    conn.commit()
+    cursor.close()
+
+
+def recreate_hot_tables(conn, users=1000, products=60, seed=42):
+    """Drop, recreate and fill the user, catalog and rollup tables"""
+    rng = random.Random(seed)
+    cursor = conn.cursor()
+    for table, ddl in HOT_TABLE_DDL.items():
+        cursor.execute(f"DROP TABLE IF EXISTS {table}")
+        cursor.execute(ddl)
+    cursor.executemany(
+        "INSERT INTO bot_users (telegram_id, username, is_active) VALUES (%s, %s, %s)",
+        [(100000000 + i, f"user{i}", rng.random() > 0.1) for i in range(users)]
+    )
+    for table in ("products_catalog", "ws_products_catalog"):
+        rows = []
+        for i in range(products):
+            duration, renew = random_subscription(rng)
+            rows.append((f"Product {i}", duration, renew, "Supplier",
+                         rng.choice([10000, 20000]), rng.choice([15000, 25000, 45000])))
+        for start in range(0, len(rows), 5000):
+            cursor.executemany(
+                f"INSERT INTO {table} (product_name, duration, renew, supplier, wholesale, retail, note, link) "
+                "VALUES (%s, %s, %s, %s, %s, %s, '', '')",
+                rows[start:start + 5000]
+            )
+    conn.commit()
+    cursor.close()
+
+
+def weighted_choice(rng, mix):
+    """Pick a value from a ((value, weight), ...) mix"""
+    values, weights = zip(*mix)
+    return rng.choices(values, weights)[0]
+
+
+def random_subscription(rng):
+    """(duration, renew) drawn from DURATION_MIX and RENEW_MIX"""
+    duration = weighted_choice(rng, DURATION_MIX)
+    return duration, weighted_choice(rng, RENEW_MIX[duration])
+
+
+def random_sale_row(rng, purchased_date, duration, renew, expiry_cache=None):
+    """Build one sale_overview parameter tuple"""
+    price = rng.choice([15000, 25000, 45000, 90000])
+    purchased = purchased_date.strftime('%Y-%m-%d')
+    if expiry_cache is None:
+        expired = bot.calculate_expired_date(purchased, duration)
+    else:
+        if (purchased, duration) not in expiry_cache:
+            expiry_cache[purchased, duration] = bot.calculate_expired_date(purchased, duration)
+        expired = expiry_cache[purchased, duration]
+    return (
+        f"Product {rng.randint(1, 60)}",
+        duration,
+        renew,
+        f"Customer {rng.randint(1, 50000)}",
+        f"user{rng.randint(1, 50000)}@example.com",
+        purchased,
+        expired,
+        rng.choice(["Aung", "Mya", "Kyaw", "Su"]),
+        "",
+        price,
+        price * 0.2,
+    )
+
+
+def insert_sale_rows(conn, table, rows, chunk_size=5000):
+    """Bulk insert sale parameter tuples into a sale table"""
+    if table == "ws_sale_overview":
+        query = (
+            "INSERT INTO ws_sale_overview (sale_product, duration, renew, customer, email, "
+            "purchased_date, expired_date, manager, note, price, profit, quantity) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, 1)"
+        )
+    else:
+        query = (
+            f"INSERT INTO {table} (sale_product, duration, renew, customer, email, "
+            "purchased_date, expired_date, manager, note, price, profit) "
+            "VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)"
+        )
+    cursor = conn.cursor()
+    for i in range(0, len(rows), chunk_size):
+        cursor.executemany(query, rows[i:i + chunk_size])
+        conn.commit()
+    cursor.close()
+
+
+def seed_history(conn, rows_per_table, today, seed=42, history_days=None):
+    """Fill both sale tables with rows_per_table sales spread over past years
+
+    By default the history grows with the row count (about 20 sales a day),
+    so the rows inside any date window stay constant; pass history_days to
+    pack a fixed span more densely instead.
+    """
+    rng = random.Random(seed)
+    if history_days is None:
+        history_days = max(365, rows_per_table // 20)
+    expiry_cache = {}
+    for table in ("sale_overview", "ws_sale_overview"):
+        rows = []
+        for _ in range(rows_per_table):
+            purchased = today - timedelta(days=rng.randint(0, history_days))
+            duration, renew = random_subscription(rng)
+            rows.append(random_sale_row(rng, purchased, duration, renew, expiry_cache))
+        insert_sale_rows(conn, table, rows)
+    analyze_tables(conn)
+
+
+def analyze_tables(conn):
+    """Refresh optimizer statistics after a bulk load"""
+    cursor = conn.cursor(buffered=True)
+    cursor.execute("ANALYZE TABLE sale_overview, ws_sale_overview")
+    cursor.fetchall()
+    cursor.close()
+
+
+async def time_samples(func, repeats=5):
+    """Return (per-call seconds, last result) for a sync or async callable"""
+    samples = []
+    result = None
+    for _ in range(repeats):
+        started = time.perf_counter()
+        result = func()
+        if inspect.isawaitable(result):
+            result = await result
+        samples.append(time.perf_counter() - started)
+    return samples, result
+
+
+async def time_call(func, repeats=5):
+    """Return (median seconds, last result) for a sync or async callable"""
+    samples, result = await time_samples(func, repeats)
+    return statistics.median(samples), result
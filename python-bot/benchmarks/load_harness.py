@@ -0,0 +1,251 @@
+"""Offline end-to-end load harness with a fake Telegram Bot API.
+
+Starts a local stand-in for the Bot API (getMe, sendMessage,
+editMessageText, answerCallbackQuery; anything else answers true) and
+builds the real Application against it with the bot's own handlers and
+update processor. Scripted synthetic users then log in, pick products,
+enter sales and fire /summary, /expiring and button bursts. Updates are
+fed straight into the application's update queue, so nothing reaches
+Telegram. Reports throughput, per-handler latency percentiles and Bot
+API call counts. Uses the scratch database described in common.py.
+
+    python benchmarks/load_harness.py --users 200 --bursts 3
+"""
+import argparse
+import asyncio
+import itertools
+import json
+import logging
+import random
+import sys
+import time
+from urllib.parse import parse_qs
+
+from telegram import Update
+from telegram.ext import ApplicationBuilder
+
+from common import (
+    bot, connect_bench_db, install_bench_pool, recreate_hot_tables,
+    recreate_sale_tables, seed_history,
+)
+from webhook_harness import callback_update, message_update, private_chat_user
+
+FAKE_TOKEN = "123456:load-harness"
+FIRST_USER_ID = 200000000
+
+
+class FakeBotAPI:
+    """Minimal HTTP/1.1 keep-alive server answering Bot API calls like Telegram would"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = {}
+        self.message_ids = itertools.count(1)
+        self.server = None
+
+    async def start(self, host="127.0.0.1", port=0):
+        self.server = await asyncio.start_server(self.handle, host, port)
+        return self.server.sockets[0].getsockname()[1]
+
+    async def stop(self):
+        self.server.close()
+        await self.server.wait_closed()
+
+    def respond(self, method, params):
+        self.calls[method] = self.calls.get(method, 0) + 1
+        if method == "getMe":
+            return {"id": 1, "is_bot": True, "first_name": "Eraverse", "username": "eraverse_load_bot",
+                    "can_join_groups": False, "can_read_all_group_messages": False,
+                    "supports_inline_queries": True}
+        if method in ("sendMessage", "editMessageText"):
+            return {
+                "message_id": int(params.get("message_id", next(self.message_ids))),
+                "date": int(time.time()),
+                "chat": {"id": int(params.get("chat_id", 0)), "type": "private"},
+                "text": params.get("text", ""),
+            }
+        return True
+
+    async def handle(self, reader, writer):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+
+                path = request_line.decode("latin-1").split()[1]
+                method = path.rstrip("/").rsplit("/", 1)[-1]
+                if headers.get("content-type", "").startswith("application/json"):
+                    params = json.loads(body or b"{}")
+                else:
+                    params = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                payload = json.dumps({"ok": True, "result": self.respond(method, params)}).encode()
+                writer.write(
+                    b"HTTP/1.1 200 OK\r\nContent-Type: application/json\r\n"
+                    + f"Content-Length: {len(payload)}\r\n\r\n".encode() + payload
+                )
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+
+def user_script(user_id, product_ids, bursts, rng):
+    """(kind, payload) steps for one simulated user: login, sale entries, then read bursts"""
+    steps = [
+        ("message", "/start"),
+        ("message", f"harness{user_id}"),
+        ("message", bot.BOT_PASSWORD),
+    ]
+    for _ in range(2):
+        product_id = rng.choice(product_ids)
+        steps += [
+            ("callback", "add_retail_sale"),
+            ("callback", f"product_{product_id}"),
+            ("message", f"Customer {user_id}\ncustomer{user_id}@example.com\nHarness"),
+        ]
+    for _ in range(bursts):
+        steps += [
+            ("message", "/summary"),
+            ("message", "/expiring"),
+            ("callback", "expiring"),
+            ("callback", "renewals"),
+            ("callback", "summary"),
+        ]
+    return steps
+
+
+def build_updates(users, bursts, product_ids, seed):
+    """Interleave every user's script round-robin into one update stream"""
+    rng = random.Random(seed)
+    update_ids = itertools.count(1)
+    scripts = []
+    for i in range(users):
+        user_id = FIRST_USER_ID + i
+        user, chat = private_chat_user(user_id)
+        scripts.append([(user, chat, kind, payload) for kind, payload in user_script(user_id, product_ids, bursts, rng)])
+
+    stream = []
+    for step in itertools.zip_longest(*scripts):
+        for item in step:
+            if item is None:
+                continue
+            user, chat, kind, payload = item
+            if kind == "message":
+                stream.append(message_update(next(update_ids), user, chat, payload))
+            else:
+                stream.append(callback_update(next(update_ids), user, chat, payload))
+    return stream
+
+
+def percentile_row(name, histogram):
+    return (f"{name:<26} {histogram.count:>7} {histogram.percentile(0.5) * 1000:>8.1f} "
+            f"{histogram.percentile(0.95) * 1000:>8.1f} {histogram.percentile(0.99) * 1000:>8.1f}")
+
+
+async def run(args):
+    # One INFO line per fake API call would drown the report
+    logging.getLogger("httpx").setLevel(logging.WARNING)
+    conn = connect_bench_db()
+    recreate_sale_tables(conn)
+    recreate_hot_tables(conn, products=args.products)
+    seed_history(conn, args.history_rows, bot.get_bangkok_today())
+    conn.close()
+    install_bench_pool()
+    await bot.reconcile_sales_rollup()
+
+    if args.unthrottled:
+        bot.GLOBAL_SEND_RATE = bot.GLOBAL_SEND_BURST = 1e9
+        bot.CHAT_SEND_RATE = bot.CHAT_SEND_BURST = 1e9
+        bot.outbound_sender = bot.OutboundSender()
+    bot.WRITE_BEHIND = args.write_behind
+    bot.metrics = bot.MetricsRegistry()
+
+    api = FakeBotAPI(latency=args.api_latency_ms / 1000)
+    port = await api.start()
+    processor = bot.PerUserUpdateProcessor(concurrency=args.concurrency)
+    app = (
+        ApplicationBuilder()
+        .token(FAKE_TOKEN)
+        .base_url(f"http://127.0.0.1:{port}/bot")
+        .base_file_url(f"http://127.0.0.1:{port}/file/bot")
+        .concurrent_updates(processor)
+        .connection_pool_size(args.concurrency * 2)
+        .build()
+    )
+    bot.add_handlers(app)
+
+    product_ids = [f"R-{i}" for i in range(1, args.products + 1)]
+    stream = [Update.de_json(data, app.bot) for data in build_updates(args.users, args.bursts, product_ids, args.seed)]
+
+    await app.initialize()
+    await app.start()
+    started = time.perf_counter()
+    for update in stream:
+        await app.update_queue.put(update)
+    await app.update_queue.join()
+    await bot.sale_writer.close()
+    # Handlers queue their replies without waiting for delivery
+    await bot.outbound_sender.wait_idle()
+    elapsed = time.perf_counter() - started
+    await app.stop()
+    await app.shutdown()
+    await api.stop()
+
+    print(f"{len(stream)} updates from {args.users} users in {elapsed:.2f}s "
+          f"({len(stream) / elapsed:.1f} updates/s, concurrency {args.concurrency})")
+    print(f"max per-user queue depth {processor.max_depth}, outbound {bot.outbound_sender.stats()}")
+    print(f"\n{'handler':<26} {'calls':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, entry in sorted(bot.metrics.handlers.items()):
+        print(percentile_row(name, entry['latency']))
+    print(f"\n{'query':<26} {'calls':>7} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8}")
+    for name, entry in sorted(bot.metrics.queries.items()):
+        print(percentile_row(name, entry['latency']))
+    print(f"\nBot API calls: {dict(sorted(api.calls.items()))}")
+
+    errors = sum(entry['errors'] for entry in bot.metrics.handlers.values())
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({
+                'updates': len(stream), 'users': args.users, 'seconds': elapsed,
+                'updates_per_second': len(stream) / elapsed, 'handler_errors': errors,
+                'handlers': {
+                    name: {'count': e['latency'].count, 'p50_ms': e['latency'].percentile(0.5) * 1000,
+                           'p95_ms': e['latency'].percentile(0.95) * 1000, 'p99_ms': e['latency'].percentile(0.99) * 1000}
+                    for name, e in bot.metrics.handlers.items()
+                },
+                'api_calls': api.calls,
+            }, f, indent=2)
+    return 1 if errors else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=100)
+    parser.add_argument("--bursts", type=int, default=2, help="read bursts per user after its sales")
+    parser.add_argument("--concurrency", type=int, default=bot.UPDATE_CONCURRENCY)
+    parser.add_argument("--products", type=int, default=60)
+    parser.add_argument("--history-rows", type=int, default=10000)
+    parser.add_argument("--api-latency-ms", type=float, default=0.0, help="simulated Bot API round trip")
+    parser.add_argument("--unthrottled", action="store_true", help="lift the outbound send rate limits")
+    parser.add_argument("--write-behind", action="store_true")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--output", help="write a JSON summary here")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
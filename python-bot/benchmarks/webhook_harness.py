@@ -0,0 +1,141 @@
+"""Local test harness for webhook mode.
+
+POSTs synthetic Telegram updates to a bot started with
+ERAVERSE_BOT_MODE=webhook and reports how quickly the webhook accepts
+them. It also checks that requests with a missing or wrong secret token
+are refused with 403. The bot's replies go to the chat IDs in the
+synthetic updates, so use a test user and chat (--user-id/--chat-id).
+Exits non-zero if any request gets an unexpected status.
+
+    ERAVERSE_BOT_MODE=webhook ERAVERSE_WEBHOOK_URL=https://bot.example.com \\
+        ERAVERSE_WEBHOOK_SECRET=s3cret python eraverse_dashboard.py
+    ERAVERSE_WEBHOOK_SECRET=s3cret python benchmarks/webhook_harness.py --updates 200
+"""
+import argparse
+import asyncio
+import itertools
+import os
+import statistics
+import sys
+import time
+
+import httpx
+
+SECRET_HEADER = "X-Telegram-Bot-Api-Secret-Token"
+
+
+def message_update(update_id, user, chat, text):
+    """Update dict for a text message (commands get a bot_command entity)"""
+    body = {
+        "message_id": update_id,
+        "date": int(time.time()),
+        "chat": chat,
+        "from": user,
+        "text": text,
+    }
+    if text.startswith("/"):
+        command = text.split()[0]
+        body["entities"] = [{"type": "bot_command", "offset": 0, "length": len(command)}]
+    return {"update_id": update_id, "message": body}
+
+
+def callback_update(update_id, user, chat, data):
+    """Update dict for an inline button tap on a bot message"""
+    return {
+        "update_id": update_id,
+        "callback_query": {
+            "id": str(update_id),
+            "from": user,
+            "chat_instance": str(chat["id"]),
+            "data": data,
+            "message": {
+                "message_id": update_id,
+                "date": int(time.time()),
+                "chat": chat,
+                "from": {"id": 1, "is_bot": True, "first_name": "Bot"},
+                "text": "menu",
+            },
+        },
+    }
+
+
+def private_chat_user(user_id):
+    """(user, chat) dicts for a simulated user in a private chat with the bot"""
+    user = {"id": user_id, "is_bot": False, "first_name": "Harness", "username": f"harness{user_id}"}
+    chat = {"id": user_id, "type": "private", "first_name": "Harness"}
+    return user, chat
+
+
+def synthetic_updates(user_id, chat_id, start_id=1):
+    """Yield an endless cycle of command, text and button-tap updates"""
+    user, chat = private_chat_user(user_id)
+    chat["id"] = chat_id
+    counter = itertools.count(start_id)
+
+    while True:
+        yield message_update(next(counter), user, chat, "/start")
+        yield message_update(next(counter), user, chat, "/summary")
+        yield callback_update(next(counter), user, chat, "expiring")
+        yield callback_update(next(counter), user, chat, "renewals")
+        yield message_update(next(counter), user, chat, "hello")
+
+
+async def post_update(client, url, update, secret):
+    headers = {SECRET_HEADER: secret} if secret is not None else {}
+    started = time.perf_counter()
+    response = await client.post(url, json=update, headers=headers)
+    return response.status_code, time.perf_counter() - started
+
+
+async def run(args):
+    url = f"http://{args.host}:{args.port}/{args.path.lstrip('/')}"
+    updates = synthetic_updates(args.user_id, args.chat_id, args.start_id)
+    failures = 0
+
+    async with httpx.AsyncClient(timeout=args.timeout) as client:
+        for label, secret in (("missing secret", None), ("wrong secret", args.secret + "-wrong")):
+            status, _ = await post_update(client, url, next(updates), secret)
+            ok = status == 403
+            failures += not ok
+            print(f"{label:>15}: HTTP {status} ({'ok' if ok else 'expected 403'})")
+
+        semaphore = asyncio.Semaphore(args.concurrency)
+
+        async def send(update):
+            async with semaphore:
+                return await post_update(client, url, update, args.secret)
+
+        started = time.perf_counter()
+        results = await asyncio.gather(*[send(next(updates)) for _ in range(args.updates)])
+        elapsed = time.perf_counter() - started
+
+    bad = [status for status, _ in results if status != 200]
+    failures += len(bad)
+    latencies = sorted(seconds * 1000 for _, seconds in results)
+    print(f"{args.updates} updates in {elapsed:.2f}s ({args.updates / elapsed:.1f}/s), "
+          f"{len(bad)} non-200 responses")
+    print(f"accept ms: p50 {statistics.median(latencies):.2f}  "
+          f"p95 {latencies[int(len(latencies) * 0.95)]:.2f}  max {latencies[-1]:.2f}")
+    return 1 if failures else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=int(os.environ.get("ERAVERSE_WEBHOOK_PORT", "8443")))
+    parser.add_argument("--path", default=os.environ.get("ERAVERSE_WEBHOOK_PATH", "telegram"))
+    parser.add_argument("--secret", default=os.environ.get("ERAVERSE_WEBHOOK_SECRET", ""))
+    parser.add_argument("--user-id", type=int, default=100000001)
+    parser.add_argument("--chat-id", type=int, default=100000001)
+    parser.add_argument("--start-id", type=int, default=1)
+    parser.add_argument("--updates", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--timeout", type=float, default=10.0)
+    args = parser.parse_args()
+    if not args.secret:
+        parser.error("--secret or ERAVERSE_WEBHOOK_SECRET is required")
+    sys.exit(asyncio.run(run(args)))
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,38 @@
 import asyncio
+import bisect
+import calendar
+import contextlib
+import csv
+import enum
+import functools
+import heapq
+import io
+import itertools
+import math
+import os
+import time
 import nest_asyncio
+import re
+import threading
+import numpy as np
+import pandas as pd
 import logging
+from cachetools import TTLCache
+from collections import OrderedDict, deque
+from concurrent.futures import ThreadPoolExecutor
 from creds import BOT_TOKEN, DB_CONFIG, CHANNEL_ID, BOT_PASSWORD
-from mysql.connector.pooling import MySQLConnectionPool
+import mysql.connector
+from mysql.connector.errors import PoolError
 from datetime import datetime, timedelta, date
 from zoneinfo import ZoneInfo
 from telegram import (
-    Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, BotCommand,
+    InlineQueryResultArticle, InputTextMessageContent
 )
+from telegram.error import BadRequest, NetworkError, RetryAfter, TimedOut
 from telegram.ext import (
-    ApplicationBuilder, CommandHandler, CallbackQueryHandler,
-    MessageHandler, ContextTypes, filters
+    ApplicationBuilder, BaseUpdateProcessor, CommandHandler, CallbackQueryHandler,
+    InlineQueryHandler, MessageHandler, ContextTypes, filters
 )
 
 
@@ -26,21 +48,430 @@ nest_asyncio.apply()
 # Global constants
 BANGKOK_TZ = ZoneInfo("Asia/Bangkok")
 BATCH_SIZE = 10
+DB_POOL_MIN_SIZE = 2
+DB_POOL_MAX_SIZE = 10
+DB_POOL_TIMEOUT = 5.0  # seconds a checkout waits for a free connection
+DB_POOL_PING_AFTER = 30  # seconds idle before a connection is pinged on checkout
+DB_POOL_IDLE_TIMEOUT = 300  # seconds idle before a connection above the minimum is closed
+PREPARED_STATEMENTS = True  # Use server-side prepared statements for queries marked prepared=True
+PREPARED_CACHE_SIZE = 32  # per connection; the server caps the total at max_prepared_stmt_count
+EXPIRING_HORIZON_DAYS = 1
+RENEWAL_HORIZON_DAYS = 2
+RENEWAL_EXPIRY_GRACE_DAYS = 3
+# Set VECTORIZED_BATCH = False to force the scalar per-row path
+VECTORIZED_BATCH = True
+VECTORIZED_BATCH_MIN_ROWS = 500
+CATALOG_CACHE_TTL = 600  # seconds
+CATALOG_CACHE_SIZE = 1024
+CACHE_VERSION_POLL_SECONDS = 30
+AUTH_CACHE_TTL = 300  # seconds; upper bound on how long a deactivated user keeps access
+AUTH_NEGATIVE_CACHE_TTL = 15
+AUTH_CACHE_SIZE = 4096
+AUTH_REVOCATION_POLL_SECONDS = 20
+ROLLUP_RECONCILE_MINUTES = 10
+ROLLUP_RECONCILE_DAYS = 40
+ROLLUP_REBUILD_CHUNK_DAYS = 31  # days rebuilt per transaction, so dashboard inserts never wait long
+# Outbound message limits (messages per second, burst size)
+GLOBAL_SEND_RATE, GLOBAL_SEND_BURST = 25, 25
+CHAT_SEND_RATE, CHAT_SEND_BURST = 1, 3
+CHANNEL_SEND_RATE, CHANNEL_SEND_BURST = 20 / 60, 3
+SEND_MAX_RETRIES = 4
+SEND_BACKOFF_SECONDS = 1.0
+TELEGRAM_MESSAGE_LIMIT = 4096
+LIST_FIELD_LIMIT = 200  # characters of a product, customer or email shown in list entries
+LIST_PAGE_SIZE = 10
+RENEWAL_SCAN_CHUNK = 50
+DIGEST_SNAPSHOT = True  # Serve /expiring, /renewals and the daily digest from a same-day in-memory snapshot
+PRODUCT_PAGE_SIZE = 20
+INLINE_SEARCH_LIMIT = 50  # Telegram's maximum per inline answer
+INLINE_CACHE_SECONDS = 30
+STREAM_CHUNK_SIZE = 500  # rows per fetch when streaming large result sets
+BULK_MAX_ROWS = 500
+BULK_MAX_FILE_BYTES = 1024 * 1024
+WRITE_BEHIND = False  # Coalesce save_sale calls into batched INSERTs under bursty load
+WRITE_BEHIND_MAX_ROWS = 50
+WRITE_BEHIND_MAX_DELAY_MS = 50
+UPDATE_CONCURRENCY = 8  # handlers running at once across all users
+UPDATE_BACKLOG_LIMIT = 1024  # updates running or waiting for their user's turn
+
+# Update delivery: "polling" (default) or "webhook", which serves an embedded
+# HTTP endpoint for Telegram to push updates to
+BOT_MODE = os.environ.get("ERAVERSE_BOT_MODE", "polling")
+WEBHOOK_URL = os.environ.get("ERAVERSE_WEBHOOK_URL", "")  # public base URL, e.g. https://bot.example.com
+WEBHOOK_PATH = os.environ.get("ERAVERSE_WEBHOOK_PATH", "telegram")
+WEBHOOK_LISTEN = os.environ.get("ERAVERSE_WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.environ.get("ERAVERSE_WEBHOOK_PORT", "8443"))
+WEBHOOK_SECRET = os.environ.get("ERAVERSE_WEBHOOK_SECRET", "")
+
+# Prometheus-format metrics on http://METRICS_LISTEN:METRICS_PORT/metrics (port 0 disables)
+METRICS_LISTEN = os.environ.get("ERAVERSE_METRICS_LISTEN", "127.0.0.1")
+METRICS_PORT = int(os.environ.get("ERAVERSE_METRICS_PORT", "9464"))
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+LATENCY_WINDOW = 1000  # recent samples kept per histogram for p50/p95/p99
+# Telegram IDs allowed to run /stats; empty disables the command
+ADMIN_TELEGRAM_IDS = {int(i) for i in os.environ.get("ERAVERSE_ADMIN_IDS", "").split(",") if i.strip()}
+
+
+
+class PooledConnection:
+    """A checked-out connection; close() hands it back to its pool"""
+
+    def __init__(self, pool, conn):
+        self._pool = pool
+        self._conn = conn
+        self._checked_out = time.monotonic()
+
+    def __getattr__(self, name):
+        return getattr(self._conn, name)
+
+    def close(self):
+        if self._conn is not None:
+            conn, self._conn = self._conn, None
+            self._pool.release(conn, time.monotonic() - self._checked_out)
+
+    def prepared_cursor(self, query, dictionary=False):
+        """(cursor, query) for a cached server-side prepared statement on this connection"""
+        return self._pool.prepared_cursor(self._conn, query, dictionary)
+
+    def discard_prepared(self, query, dictionary=False):
+        """Drop a cached prepared statement, e.g. after it failed"""
+        self._pool.discard_prepared(self._conn, query, dictionary)
+
+class DBConnectionPool:
+    """Thread-safe MySQL connection pool that queues checkouts instead of failing
+
+    Connections are opened on demand up to max_size. When every connection is
+    in use, get_connection waits up to timeout seconds for one to come back
+    before raising PoolError. Connections run in autocommit mode, so returning
+    one needs no session reset; only a connection left inside a transaction is
+    rolled back. A connection idle for longer than DB_POOL_PING_AFTER is pinged
+    before reuse, and connections above min_size are closed after
+    DB_POOL_IDLE_TIMEOUT.
+
+    Each connection also keeps an LRU cache of prepared statements keyed by
+    SQL text. The cache lives and dies with the connection: closing or
+    discarding a connection closes its statements.
+    """
 
+    def __init__(self, config, min_size=DB_POOL_MIN_SIZE, max_size=DB_POOL_MAX_SIZE, timeout=DB_POOL_TIMEOUT):
+        self.config = dict(config, autocommit=True)
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.condition = threading.Condition()
+        self.idle = deque()  # (connection, last returned), most recently used on the right
+        self.size = 0  # open connections, including ones being opened
+        self.in_use = 0
+        self.waiting = 0
+        self.checkouts = 0
+        self.timeouts = 0
+        self.opened = 0
+        self.closed = 0
+        self.stale = 0
+        self.wait_times = deque(maxlen=1000)
+        self.hold_times = deque(maxlen=1000)
+        self.statements = {}  # id(connection) -> OrderedDict of (query, dictionary) -> (cursor, query)
+        self.statement_hits = 0
+        self.statement_prepares = 0
+
+    def _open(self):
+        conn = mysql.connector.connect(**self.config)
+        with self.condition:
+            self.opened += 1
+        return conn
+
+    def _close(self, conn):
+        with self.condition:
+            statements = self.statements.pop(id(conn), {})
+        try:
+            for cursor, query in statements.values():
+                cursor.close()
+            conn.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.closed += 1
 
+    def prepared_cursor(self, conn, query, dictionary=False):
+        """(cursor, query) for query prepared on a checked-out connection
 
-# Database connection pool
-try:
-    db_pool = MySQLConnectionPool(
-        pool_name="eraverse_pool",
-        pool_size=10,
-        pool_reset_session=True,
-        **DB_CONFIG
-    )
-    logger.info("Database connection pool created successfully")
-except Exception as e:
-    logger.error(f"Failed to create database pool: {e}")
-    db_pool = None
+        Execute with the returned query object: mysql.connector only skips the
+        re-prepare when it is handed the identical string it prepared.
+        """
+        key = (query, dictionary)
+        with self.condition:
+            cache = self.statements.setdefault(id(conn), OrderedDict())
+            entry = cache.get(key)
+            if entry is not None:
+                cache.move_to_end(key)
+                self.statement_hits += 1
+                return entry
+            self.statement_prepares += 1
+        
+        entry = cache[key] = (conn.cursor(prepared=True, dictionary=dictionary), query)
+        if len(cache) > PREPARED_CACHE_SIZE:
+            evicted_cursor, evicted_query = cache.popitem(last=False)[1]
+            evicted_cursor.close()
+        return entry
+
+    def discard_prepared(self, conn, query, dictionary=False):
+        """Forget (and close) a cached prepared statement"""
+        entry = self.statements.get(id(conn), {}).pop((query, dictionary), None)
+        if entry is not None:
+            try:
+                entry[0].close()
+            except Exception:
+                pass
+
+    def warm(self):
+        """Open connections up to min_size; raises if the database is unreachable"""
+        with self.condition:
+            needed = max(0, self.min_size - self.size)
+            self.size += needed
+        opened = []
+        try:
+            for _ in range(needed):
+                opened.append(self._open())
+        finally:
+            with self.condition:
+                self.size -= needed - len(opened)
+                now = time.monotonic()
+                self.idle.extendleft((conn, now) for conn in opened)
+                self.condition.notify_all()
+
+    def get_connection(self, timeout=None):
+        """Check out a connection, waiting up to timeout (default self.timeout) seconds"""
+        started = time.monotonic()
+        deadline = started + (self.timeout if timeout is None else timeout)
+        conn = None
+        with self.condition:
+            self.waiting += 1
+            try:
+                while True:
+                    if self.idle:
+                        conn, last_used = self.idle.pop()
+                        break
+                    if self.size < self.max_size:
+                        self.size += 1
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self.timeouts += 1
+                        raise PoolError(f"No database connection free after {deadline - started:.1f}s ({self.max_size} in use)")
+                    self.condition.wait(remaining)
+            finally:
+                self.waiting -= 1
+            self.in_use += 1
+        
+        try:
+            if conn is not None and time.monotonic() - last_used > DB_POOL_PING_AFTER:
+                try:
+                    conn.ping(reconnect=False)
+                except Exception:
+                    with self.condition:
+                        self.stale += 1
+                    self._close(conn)
+                    conn = None
+            if conn is None:
+                conn = self._open()
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.in_use -= 1
+                self.condition.notify()
+            raise
+        
+        with self.condition:
+            self.checkouts += 1
+            self.wait_times.append(time.monotonic() - started)
+        return PooledConnection(self, conn)
+
+    def release(self, conn, held):
+        """Take back a connection checked out for held seconds"""
+        try:
+            if conn.in_transaction:
+                conn.rollback()
+            healthy = True
+        except Exception:
+            healthy = False
+        
+        now = time.monotonic()
+        expired = []
+        with self.condition:
+            self.in_use -= 1
+            self.hold_times.append(held)
+            if healthy:
+                self.idle.append((conn, now))
+            else:
+                self.size -= 1
+                expired.append(conn)
+            # Shrink back towards min_size, oldest idle connection first
+            while self.idle and self.size > self.min_size and now - self.idle[0][1] > DB_POOL_IDLE_TIMEOUT:
+                expired.append(self.idle.popleft()[0])
+                self.size -= 1
+            self.condition.notify()
+        
+        for stale_conn in expired:
+            self._close(stale_conn)
+
+    def stats(self):
+        """Pool size, in-use and waiting counts, and checkout wait / hold times in milliseconds"""
+        with self.condition:
+            waits = sorted(self.wait_times)
+            holds = sorted(self.hold_times)
+            return {
+                'size': self.size,
+                'idle': len(self.idle),
+                'in_use': self.in_use,
+                'waiting': self.waiting,
+                'checkouts': self.checkouts,
+                'timeouts': self.timeouts,
+                'opened': self.opened,
+                'closed': self.closed,
+                'stale': self.stale,
+                'wait_ms_avg': sum(waits) / len(waits) * 1000 if waits else 0,
+                'wait_ms_p95': waits[int(len(waits) * 0.95)] * 1000 if waits else 0,
+                'wait_ms_max': waits[-1] * 1000 if waits else 0,
+                'hold_ms_avg': sum(holds) / len(holds) * 1000 if holds else 0,
+                'hold_ms_p95': holds[int(len(holds) * 0.95)] * 1000 if holds else 0,
+                'statements_cached': sum(len(cache) for cache in self.statements.values()),
+                'statement_hits': self.statement_hits,
+                'statement_prepares': self.statement_prepares,
+            }
+
+# Database connection pool; connections open lazily and main() warms it up
+db_pool = DBConnectionPool(DB_CONFIG)
+
+# Blocking mysql.connector calls run here instead of on the event loop.
+# Twice the pool size, so bursts beyond it queue in the pool (with its
+# timeout and wait metrics) rather than invisibly in the executor.
+db_executor = ThreadPoolExecutor(max_workers=DB_POOL_MAX_SIZE * 2, thread_name_prefix="eraverse_db")
+
+class LatencyHistogram:
+    """Cumulative histogram over LATENCY_BUCKETS plus a window of recent samples for percentiles"""
+
+    def __init__(self, buckets=LATENCY_BUCKETS):
+        self.buckets = buckets
+        self.bucket_counts = [0] * len(buckets)
+        self.count = 0
+        self.sum = 0.0
+        self.recent = deque(maxlen=LATENCY_WINDOW)
+
+    def observe(self, seconds):
+        self.count += 1
+        self.sum += seconds
+        self.recent.append(seconds)
+        index = bisect.bisect_left(self.buckets, seconds)
+        if index < len(self.buckets):
+            self.bucket_counts[index] += 1
+
+    def percentile(self, fraction):
+        """Latency at fraction (0-1) of the recent window, in seconds"""
+        samples = sorted(self.recent)
+        if not samples:
+            return 0
+        return samples[min(len(samples) - 1, int(len(samples) * fraction))]
+
+    def prometheus_lines(self, metric, labels):
+        cumulative = 0
+        for bound, count in zip(self.buckets, self.bucket_counts):
+            cumulative += count
+            yield f'{metric}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{metric}_bucket{{{labels},le="+Inf"}} {self.count}'
+        yield f'{metric}_sum{{{labels}}} {self.sum:.6f}'
+        yield f'{metric}_count{{{labels}}} {self.count}'
+
+class MetricsRegistry:
+    """Query and handler latency, row and byte counts, updated from the event loop"""
+
+    def __init__(self):
+        self.queries = {}
+        self.handlers = {}
+
+    def observe_query(self, name, seconds, rows=0, size=0, error=False):
+        entry = self.queries.get(name)
+        if entry is None:
+            entry = self.queries[name] = {'latency': LatencyHistogram(), 'rows': 0, 'bytes': 0, 'errors': 0}
+        entry['latency'].observe(seconds)
+        entry['rows'] += rows
+        entry['bytes'] += size
+        entry['errors'] += error
+
+    def observe_handler(self, name, seconds, error=False):
+        entry = self.handlers.get(name)
+        if entry is None:
+            entry = self.handlers[name] = {'latency': LatencyHistogram(), 'errors': 0}
+        entry['latency'].observe(seconds)
+        entry['errors'] += error
+
+    def render_prometheus(self, gauges):
+        """Prometheus text exposition; gauges maps component name -> stats() dict"""
+        lines = [
+            "# HELP eraverse_query_duration_seconds Database call latency by logical query name",
+            "# TYPE eraverse_query_duration_seconds histogram",
+        ]
+        for name, entry in sorted(self.queries.items()):
+            lines.extend(entry['latency'].prometheus_lines("eraverse_query_duration_seconds", f'query="{name}"'))
+        for metric, key, help_text in (
+            ("eraverse_query_rows_total", 'rows', "Rows returned or written"),
+            ("eraverse_query_bytes_total", 'bytes', "Approximate result size in bytes"),
+            ("eraverse_query_errors_total", 'errors', "Failed database calls"),
+        ):
+            lines.append(f"# HELP {metric} {help_text}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.extend(f'{metric}{{query="{name}"}} {entry[key]}' for name, entry in sorted(self.queries.items()))
+        
+        lines.append("# HELP eraverse_handler_duration_seconds Telegram handler latency")
+        lines.append("# TYPE eraverse_handler_duration_seconds histogram")
+        for name, entry in sorted(self.handlers.items()):
+            lines.extend(entry['latency'].prometheus_lines("eraverse_handler_duration_seconds", f'handler="{name}"'))
+        lines.append("# HELP eraverse_handler_errors_total Handler calls that raised")
+        lines.append("# TYPE eraverse_handler_errors_total counter")
+        lines.extend(f'eraverse_handler_errors_total{{handler="{name}"}} {entry["errors"]}' for name, entry in sorted(self.handlers.items()))
+        
+        for component, stats in gauges.items():
+            for key, value in stats.items():
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    metric = f"eraverse_{component}_{key}"
+                    lines.append(f"# TYPE {metric} gauge")
+                    lines.append(f"{metric} {value}")
+        return "\n".join(lines) + "\n"
+
+metrics = MetricsRegistry()
+
+def result_size(result):
+    """(rows, approximate bytes) of a query result, for metrics"""
+    if result is None:
+        return 0, 0
+    rows = result if isinstance(result, list) else [result]
+    size = 0
+    for row in rows:
+        values = row.values() if isinstance(row, dict) else row
+        size += sum(len(str(value)) for value in values if value is not None)
+    return len(rows), size
+
+def call_and_measure_sync(func, *args, **kwargs):
+    """Run a blocking database call and size its result on the same executor thread
+
+    Returns (result, rows, approximate bytes), keeping result_size's per-value
+    work off the event loop.
+    """
+    result = func(*args, **kwargs)
+    return (result, *result_size(result))
+
+# Product catalog cache: ('type', product_type) -> product list,
+# ('id', 'R-12' / 'WS-3') -> product details
+catalog_cache = TTLCache(maxsize=CATALOG_CACHE_SIZE, ttl=CATALOG_CACHE_TTL)
+
+# Last seen bot_cache_versions.version per name
+cache_versions = {}
+
+# telegram_id -> True for active bot users, and a shorter-lived cache of misses
+auth_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_CACHE_TTL)
+auth_negative_cache = TTLCache(maxsize=AUTH_CACHE_SIZE, ttl=AUTH_NEGATIVE_CACHE_TTL)
+
+# (row count, checksum of telegram_id:is_active) from the last bot_users poll
+bot_users_fingerprint = None
 
 # Utility functions
 def get_bangkok_now():
@@ -80,12 +511,20 @@ def get_db_connection():
         raise RuntimeError("Database pool not initialized")
     return db_pool.get_connection()
 
-def execute_query(query, params=None, fetch_type='all', dictionary=False):
-    """Execute database query with proper error handling and connection management"""
+def execute_query_sync(query, params=None, fetch_type='all', dictionary=False, prepared=False):
+    """Execute database query with proper error handling and connection management
+
+    prepared=True runs the query as a server-side prepared statement cached on
+    the connection, so hot queries skip the parse on repeat calls.
+    """
     conn = None
+    prepared = prepared and PREPARED_STATEMENTS
     try:
         conn = get_db_connection()
-        cursor = conn.cursor(dictionary=dictionary, buffered=True)
+        if prepared:
+            cursor, query = conn.prepared_cursor(query, dictionary)
+        else:
+            cursor = conn.cursor(dictionary=dictionary, buffered=True)
         
         if params:
             cursor.execute(query, params)
@@ -100,11 +539,16 @@ def execute_query(query, params=None, fetch_type='all', dictionary=False):
             result = cursor.fetchall()
         elif fetch_type == 'one':
             result = cursor.fetchone()
+            if prepared and result is not None:
+                # Prepared cursors are unbuffered; drain them for the next call
+                cursor.fetchall()
         else:
             result = None
             
         return result
     except Exception as e:
+        if prepared and conn:
+            conn.discard_prepared(query, dictionary)
         logger.error(f"Database query error: {e}")
         logger.error(f"Query: {query}")
         if params:
@@ -117,8 +561,145 @@ def execute_query(query, params=None, fetch_type='all', dictionary=False):
         if conn:
             conn.close()
 
-def fetch_products_by_type(product_type=None):
-    """Fetch products with optional type filter - optimized version"""
+def execute_transaction_sync(statements, prepared=False):
+    """Execute (query, params) pairs on one connection and commit them together
+
+    With prepared=True, single-row statements use the connection's cached
+    prepared statements; multi-row batches stay on one multi-row executemany.
+    Returns the AUTO_INCREMENT id of the first row the first statement inserted.
+    """
+    conn = None
+    prepared = prepared and PREPARED_STATEMENTS
+    used_prepared = []
+    first_id = None
+    try:
+        conn = get_db_connection()
+        conn.start_transaction()
+        cursor = conn.cursor()
+        
+        for index, (query, params) in enumerate(statements):
+            # A list of parameter tuples means one batched executemany
+            if prepared and (not isinstance(params, list) or len(params) == 1):
+                used_prepared.append(query)
+                statement_cursor, query = conn.prepared_cursor(query)
+                statement_cursor.execute(query, params[0] if isinstance(params, list) else params)
+            elif isinstance(params, list):
+                statement_cursor = cursor
+                cursor.executemany(query, params)
+            else:
+                statement_cursor = cursor
+                cursor.execute(query, params)
+            if index == 0:
+                first_id = statement_cursor.lastrowid
+        
+        conn.commit()
+        return first_id
+    except Exception as e:
+        logger.error(f"Database transaction error: {e}")
+        if conn:
+            for query in used_prepared:
+                conn.discard_prepared(query)
+            conn.rollback()
+        raise
+    finally:
+        if conn:
+            conn.close()
+
+async def run_in_db_executor(func, *args, **kwargs):
+    """Run a blocking database callable on the DB executor and await its result"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(db_executor, functools.partial(func, *args, **kwargs))
+
+async def execute_query(query, params=None, fetch_type='all', dictionary=False, prepared=False, name='query'):
+    """Execute database query without blocking the event loop
+
+    name labels the call in the query metrics (e.g. 'auth_check').
+    """
+    started = time.perf_counter()
+    try:
+        result, rows, size = await run_in_db_executor(
+            call_and_measure_sync, execute_query_sync, query, params,
+            fetch_type=fetch_type, dictionary=dictionary, prepared=prepared
+        )
+    except Exception:
+        metrics.observe_query(name, time.perf_counter() - started, error=True)
+        raise
+    metrics.observe_query(name, time.perf_counter() - started, rows, size)
+    return result
+
+async def execute_transaction(statements, prepared=False, name='transaction'):
+    """Execute several statements in one transaction without blocking the event loop"""
+    started = time.perf_counter()
+    try:
+        first_id = await run_in_db_executor(execute_transaction_sync, statements, prepared=prepared)
+    except Exception:
+        metrics.observe_query(name, time.perf_counter() - started, error=True)
+        raise
+    rows = sum(len(params) if isinstance(params, list) else 1 for query, params in statements)
+    metrics.observe_query(name, time.perf_counter() - started, rows)
+    return first_id
+
+def open_query_stream_sync(query, params=None, dictionary=False):
+    """Check out a connection and start query on an unbuffered cursor"""
+    conn = get_db_connection()
+    try:
+        cursor = conn.cursor(dictionary=dictionary)
+        cursor.execute(query, params)
+        return conn, cursor
+    except Exception as e:
+        logger.error(f"Database query error: {e}")
+        logger.error(f"Query: {query}")
+        conn.close()
+        raise
+
+def close_query_stream_sync(conn):
+    """Discard any unread rows and hand the connection back to the pool"""
+    try:
+        conn.consume_results()
+    finally:
+        conn.close()
+
+async def stream_query(query, params=None, dictionary=False, chunk_size=STREAM_CHUNK_SIZE, name='query'):
+    """Yield the result of query in lists of up to chunk_size rows
+
+    Rows come from an unbuffered cursor, so only one chunk is in memory at a
+    time and the connection is held just while the stream is consumed. Wrap
+    in contextlib.aclosing() when the consumer may stop early. The query
+    metrics time how long the stream was open.
+    """
+    started = time.perf_counter()
+    rows = size = 0
+    error = False
+    try:
+        conn, cursor = await run_in_db_executor(open_query_stream_sync, query, params, dictionary)
+    except Exception:
+        metrics.observe_query(name, time.perf_counter() - started, error=True)
+        raise
+    
+    try:
+        while True:
+            chunk, chunk_rows, chunk_size_bytes = await run_in_db_executor(
+                call_and_measure_sync, cursor.fetchmany, chunk_size
+            )
+            if not chunk:
+                break
+            rows += chunk_rows
+            size += chunk_size_bytes
+            yield chunk
+    except Exception:
+        error = True
+        raise
+    finally:
+        await run_in_db_executor(close_query_stream_sync, conn)
+        metrics.observe_query(name, time.perf_counter() - started, rows, size, error)
+
+async def fetch_products_by_type(product_type=None):
+    """Fetch products with optional type filter, served from the catalog cache when fresh"""
+    cache_key = ('type', product_type or 'all')
+    products = catalog_cache.get(cache_key)
+    if products is not None:
+        return products
+    
     if product_type == 'retail':
         query = """
             SELECT 
@@ -169,22 +750,29 @@ def fetch_products_by_type(product_type=None):
             ORDER BY product_name
         """
     
-    return execute_query(query, dictionary=True)
+    products = await execute_query(query, dictionary=True, name='catalog_list')
+    catalog_cache[cache_key] = products
+    return products
 
-def fetch_products():
+async def fetch_products():
     """Fetch all products from both retail and wholesale products_catalog tables"""
-    return fetch_products_by_type()
+    return await fetch_products_by_type()
 
-def fetch_retail_products():
+async def fetch_retail_products():
     """Fetch only retail products from products_catalog table"""
-    return fetch_products_by_type('retail')
+    return await fetch_products_by_type('retail')
 
-def fetch_wholesale_products():
+async def fetch_wholesale_products():
     """Fetch only wholesale products from ws_products_catalog table"""
-    return fetch_products_by_type('wholesale')
+    return await fetch_products_by_type('wholesale')
 
-def fetch_product_details(product_id):
+async def fetch_product_details(product_id):
     """Fetch product details by ID from either retail or wholesale table"""
+    cache_key = ('id', product_id)
+    product = catalog_cache.get(cache_key)
+    if product is not None:
+        return product
+    
     if product_id.startswith('R-'):
         actual_id = product_id.replace('R-', '')
         query = "SELECT *, 'retail' as product_type FROM products_catalog WHERE product_id = %s"
@@ -196,21 +784,102 @@ def fetch_product_details(product_id):
         actual_id = product_id
         query = "SELECT *, 'retail' as product_type FROM products_catalog WHERE product_id = %s"
     
-    return execute_query(query, (actual_id,), fetch_type='one', dictionary=True)
+    product = await execute_query(query, (actual_id,), fetch_type='one', dictionary=True, prepared=True, name='product_details')
+    if product:
+        catalog_cache[cache_key] = product
+    return product
+
+def invalidate_catalog_cache():
+    """Drop every cached product list and product detail"""
+    global product_search_index
+    catalog_cache.clear()
+    product_search_index = None
+    logger.info("Product catalog cache invalidated")
+
+class ProductSearchIndex:
+    """In-memory product name index for inline search
+
+    Needles of three or more characters are matched through a trigram index;
+    shorter ones scan every name, which the catalog is small enough for. Only
+    the raw product_name is indexed; the Retail/Wholesale label is added when
+    results are rendered.
+    """
+
+    def __init__(self, products):
+        self.products = products
+        self.names = [product['product_name'].lower() for product in products]
+        self.trigrams = {}
+        for i, name in enumerate(self.names):
+            for gram in self._trigrams(name):
+                self.trigrams.setdefault(gram, set()).add(i)
+        self.built_at = time.monotonic()
+
+    @staticmethod
+    def _trigrams(text):
+        return {text[i:i + 3] for i in range(len(text) - 2)}
+
+    def search(self, text, limit=INLINE_SEARCH_LIMIT):
+        """Products whose name contains text, word-prefix matches first"""
+        needle = " ".join(text.lower().split())
+        if not needle:
+            return self.products[:limit]
+        
+        if len(needle) < 3:
+            candidates = range(len(self.names))
+        else:
+            postings = sorted((self.trigrams.get(gram, set()) for gram in self._trigrams(needle)), key=len)
+            candidates = set.intersection(*postings)
+        
+        matches = [i for i in candidates if needle in self.names[i]]
+        matches.sort(key=lambda i: (
+            not any(word.startswith(needle) for word in self.names[i].split()),
+            self.names[i]
+        ))
+        return [self.products[i] for i in matches[:limit]]
+
+product_search_index = None
+
+async def get_product_search_index():
+    """Current product search index, rebuilt after catalog invalidation or TTL expiry"""
+    global product_search_index
+    index = product_search_index
+    if index is None or time.monotonic() - index.built_at > CATALOG_CACHE_TTL:
+        products = await fetch_retail_products() + await fetch_wholesale_products()
+        index = product_search_index = ProductSearchIndex(products)
+    return index
+
+# bot_cache_versions name -> invalidation hook
+CACHE_INVALIDATORS = {
+    'catalog': invalidate_catalog_cache,
+}
+
+async def poll_cache_versions(context: ContextTypes.DEFAULT_TYPE):
+    """Invalidate caches whose bot_cache_versions row was bumped by the PHP API"""
+    try:
+        rows = await execute_query("SELECT name, version FROM bot_cache_versions", name='cache_versions_poll')
+    except Exception as e:
+        logger.error(f"Error polling cache versions: {e}")
+        return
+    
+    for name, version in rows:
+        invalidate = CACHE_INVALIDATORS.get(name)
+        if invalidate is None:
+            continue
+        # The first poll only records the baseline
+        if name in cache_versions and cache_versions[name] != version:
+            invalidate()
+        cache_versions[name] = version
 
-def get_summary_data(date_str):
-    """Get summary data for a specific date from both retail and wholesale tables"""
+async def get_summary_data(date_str):
+    """Get summary data for a specific date from the daily sales rollup"""
     query = """
-        SELECT SUM(price), SUM(profit)
-        FROM (
-            SELECT price, profit FROM sale_overview WHERE purchased_date = %s
-            UNION ALL
-            SELECT price, profit FROM ws_sale_overview WHERE purchased_date = %s
-        ) combined_sales
+        SELECT SUM(total_sales), SUM(total_profit)
+        FROM sales_daily_rollup
+        WHERE sale_date = %s
     """
     
     try:
-        result = execute_query(query, (date_str, date_str), fetch_type='one')
+        result = await execute_query(query, (date_str,), fetch_type='one', prepared=True, name='summary_day')
         
         if result and result[0] is not None:
             total_sales = float(result[0])
@@ -222,20 +891,22 @@ def get_summary_data(date_str):
         logger.error(f"Error in get_summary_data: {e}")
         return None, None
 
-def get_monthly_summary():
-    """Get monthly summary data from both retail and wholesale tables"""
-    current_month = get_bangkok_now().strftime('%Y-%m')
+async def get_monthly_summary():
+    """Get monthly summary data from the daily sales rollup"""
+    today = get_bangkok_today()
+    month_start = today.replace(day=1)
+    month_end = today.replace(day=calendar.monthrange(today.year, today.month)[1])
     query = """
-        SELECT SUM(price), SUM(profit), COUNT(*)
-        FROM (
-            SELECT price, profit FROM sale_overview WHERE purchased_date LIKE %s
-            UNION ALL
-            SELECT price, profit FROM ws_sale_overview WHERE purchased_date LIKE %s
-        ) combined_sales
+        SELECT SUM(total_sales), SUM(total_profit), SUM(order_count)
+        FROM sales_daily_rollup
+        WHERE sale_date BETWEEN %s AND %s
     """
     
     try:
-        result = execute_query(query, (f"{current_month}%", f"{current_month}%"), fetch_type='one')
+        result = await execute_query(
+            query, (month_start.strftime('%Y-%m-%d'), month_end.strftime('%Y-%m-%d')), fetch_type='one',
+            name='summary_month'
+        )
         
         if result and result[0] is not None:
             monthly_sales = float(result[0])
@@ -252,53 +923,193 @@ def get_monthly_summary():
         logger.error(f"Error in get_monthly_summary: {e}")
         return 0, 0, 0
 
-def get_today_sales_details():
-    """Get detailed sales for today from both retail and wholesale tables"""
-    today = get_bangkok_now().strftime('%Y-%m-%d')
-    query = """
-        SELECT 
-            CONCAT('Retail - ', sale_product) as sale_product, 
-            customer, 
-            price, 
-            profit, 
-            manager,
-            'retail' as sale_type
-        FROM sale_overview
-        WHERE purchased_date = %s
+async def reconcile_sales_rollup(start_date=None, end_date=None):
+    """Rebuild sales_daily_rollup from the sale tables for a date range (whole history by default)
+
+    The range is rebuilt ROLLUP_REBUILD_CHUNK_DAYS at a time, each chunk in
+    its own short transaction, so the sale tables are never locked for the
+    length of a full rebuild.
+    """
+    whole_history = start_date is None and end_date is None
+    try:
+        if start_date is None or end_date is None:
+            first_day, last_day = await execute_query("""
+                SELECT MIN(first_day), MAX(last_day) FROM (
+                    SELECT MIN(purchased_date) AS first_day, MAX(purchased_date) AS last_day FROM sale_overview
+                    UNION ALL
+                    SELECT MIN(purchased_date), MAX(purchased_date) FROM ws_sale_overview
+                ) bounds
+            """, fetch_type='one', name='rollup_bounds')
+            if first_day is None:
+                if whole_history:
+                    await execute_transaction([("DELETE FROM sales_daily_rollup", ())], name='rollup_reconcile')
+                    logger.info("Sales rollup cleared: no sales")
+                return True
+            
+            start_date = parse_date_safe(start_date or first_day)
+            end_date = parse_date_safe(end_date or last_day)
         
-        UNION ALL
+        if whole_history:
+            # Days outside the sales' range can only hold rows of deleted sales
+            await execute_transaction([(
+                "DELETE FROM sales_daily_rollup WHERE sale_date < %s OR sale_date > %s",
+                (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+            )], name='rollup_reconcile')
         
+        chunk_start = start_date
+        while chunk_start <= end_date:
+            chunk_end = min(end_date, chunk_start + timedelta(days=ROLLUP_REBUILD_CHUNK_DAYS - 1))
+            await execute_transaction(rollup_rebuild_statements(chunk_start, chunk_end), name='rollup_reconcile')
+            chunk_start = chunk_end + timedelta(days=1)
+        
+        logger.info(f"Sales rollup reconciled for {start_date} to {end_date}")
+        return True
+    except Exception as e:
+        logger.error(f"Error in reconcile_sales_rollup: {e}")
+        return False
+
+def rollup_rebuild_statements(start_date, end_date):
+    """Transaction statements that rebuild the rollup rows for one date range"""
+    window = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    # Rebuilding the range in one transaction also drops days whose sales
+    # were deleted or moved through the PHP dashboard
+    statements = [
+        ("DELETE FROM sales_daily_rollup WHERE sale_date BETWEEN %s AND %s", window),
+    ]
+    for table, sale_type in (('sale_overview', 'retail'), ('ws_sale_overview', 'wholesale')):
+        statements.append((f"""
+            INSERT INTO sales_daily_rollup (sale_date, sale_type, total_sales, total_profit, order_count)
+            SELECT purchased_date, '{sale_type}', SUM(price), SUM(profit), COUNT(*)
+            FROM {table}
+            WHERE purchased_date BETWEEN %s AND %s
+            GROUP BY purchased_date
+        """, window))
+    return statements
+
+async def reconcile_sales_rollup_job(context: ContextTypes.DEFAULT_TYPE):
+    """Periodic rollup reconciliation: recent days by default, full history when job data asks for it"""
+    if context.job.data == 'full':
+        await reconcile_sales_rollup()
+    else:
+        today = get_bangkok_today()
+        await reconcile_sales_rollup(today - timedelta(days=ROLLUP_RECONCILE_DAYS), today)
+
+def today_sales_queries(date_str):
+    """Per-table (SQL, params) for one day's sales, most expensive first
+
+    idx_*_purchased_price lets each branch read the day's rows straight off
+    the index, backwards, instead of filesorting them.
+    """
+    return [(f"""
         SELECT 
-            CONCAT('Wholesale - ', sale_product) as sale_product, 
+            CONCAT('{rank.prefix}', sale_product) as sale_product, 
             customer, 
             price, 
             profit, 
             manager,
-            'wholesale' as sale_type
-        FROM ws_sale_overview
+            '{rank.label}' as sale_type,
+            sale_id
+        FROM {table}
         WHERE purchased_date = %s
-        
-        ORDER BY price DESC
-    """
+        ORDER BY price DESC, sale_id DESC
+    """, (date_str,)) for table, rank in SALE_TABLES]
+
+def today_sales_key(sale):
+    return (sale['price'], sale['sale_type'] == 'retail', sale['sale_id'])
+
+async def get_today_sales_details():
+    """Get detailed sales for today from both retail and wholesale tables"""
+    today = get_bangkok_now().strftime('%Y-%m-%d')
     
     try:
-        return execute_query(query, (today, today), dictionary=True)
+        return await fetch_merged(
+            today_sales_queries(today), today_sales_key, reverse=True, dictionary=True, name='today_sales'
+        )
     except Exception as e:
         logger.error(f"Error in get_today_sales_details: {e}")
         return []
 
+async def _timed_phase(name, awaitable, timings):
+    """Await one summary phase and record its wall time in milliseconds"""
+    started = time.perf_counter()
+    try:
+        return await awaitable
+    finally:
+        timings[name] = (time.perf_counter() - started) * 1000
+
+async def fetch_summary_bundle(date_str, include_monthly=True):
+    """Fetch daily totals, monthly totals and today's sales concurrently
+
+    Each phase checks out its own pooled connection on the DB executor, so the
+    whole bundle costs about as much as the slowest query.
+    """
+    timings = {}
+    started = time.perf_counter()
+    
+    phases = [
+        _timed_phase('daily', get_summary_data(date_str), timings),
+        _timed_phase('today_sales', get_today_sales_details(), timings),
+    ]
+    if include_monthly:
+        phases.append(_timed_phase('monthly', get_monthly_summary(), timings))
+    
+    results = await asyncio.gather(*phases)
+    
+    timings['total'] = (time.perf_counter() - started) * 1000
+    logger.info("Summary phases: " + ", ".join(f"{name}={ms:.1f}ms" for name, ms in timings.items()))
+    
+    daily, today_sales_details = results[0], results[1]
+    monthly = results[2] if include_monthly else None
+    return daily, monthly, today_sales_details
+
 # Authentication functions
-def check_user_auth(telegram_id):
-    """Check if user is authenticated"""
+async def check_user_auth(telegram_id, refresh=False):
+    """Check if user is authenticated, using the auth cache unless refresh is set"""
+    if not refresh:
+        if telegram_id in auth_cache:
+            return True
+        if telegram_id in auth_negative_cache:
+            return False
+    
     query = "SELECT id FROM bot_users WHERE telegram_id = %s AND is_active = TRUE"
     try:
-        result = execute_query(query, (telegram_id,), fetch_type='one')
-        return result is not None
+        result = await execute_query(query, (telegram_id,), fetch_type='one', prepared=True, name='auth_check')
     except Exception as e:
         logger.error(f"Error checking user auth: {e}")
         return False
+    
+    if result is not None:
+        auth_cache[telegram_id] = True
+        auth_negative_cache.pop(telegram_id, None)
+        return True
+    auth_negative_cache[telegram_id] = True
+    auth_cache.pop(telegram_id, None)
+    return False
+
+def invalidate_auth_cache():
+    """Forget every cached auth decision"""
+    auth_cache.clear()
+    auth_negative_cache.clear()
+    logger.info("Auth cache invalidated")
+
+async def poll_bot_users_fingerprint(context: ContextTypes.DEFAULT_TYPE):
+    """Invalidate the auth cache when any bot_users row is added, removed or (de)activated"""
+    global bot_users_fingerprint
+    query = """
+        SELECT COUNT(*), COALESCE(BIT_XOR(CRC32(CONCAT(telegram_id, ':', is_active))), 0)
+        FROM bot_users
+    """
+    try:
+        fingerprint = tuple(await execute_query(query, fetch_type='one', name='auth_fingerprint'))
+    except Exception as e:
+        logger.error(f"Error polling bot_users fingerprint: {e}")
+        return
+    
+    if bot_users_fingerprint is not None and fingerprint != bot_users_fingerprint:
+        invalidate_auth_cache()
+    bot_users_fingerprint = fingerprint
 
-def save_authenticated_user(telegram_id, username):
+async def save_authenticated_user(telegram_id, username):
     """Save authenticated user to database"""
     query = """
         INSERT INTO bot_users (telegram_id, username) 
@@ -308,11 +1119,14 @@ def save_authenticated_user(telegram_id, username):
         last_login = CURRENT_TIMESTAMP
     """
     try:
-        execute_query(query, (telegram_id, username), fetch_type=None)
-        return True
+        await execute_query(query, (telegram_id, username), fetch_type=None, name='auth_save_user')
     except Exception as e:
         logger.error(f"Error saving authenticated user: {e}")
         return False
+    
+    # Warm the auth cache from the stored row so the next update skips the lookup
+    await check_user_auth(telegram_id, refresh=True)
+    return True
 
 def validate_credentials(username, password):
     """Validate username and password against bot credentials"""
@@ -324,40 +1138,172 @@ def validate_credentials(username, password):
 
 
 
-def get_expiring_soon_products():
-    """Get products that are expiring soon from both retail and wholesale tables"""
-    query = """
-        SELECT 
-            CONCAT('Retail - ', sale_product) as sale_product, 
-            customer, 
-            email, 
-            purchased_date, 
-            expired_date,
-            'retail' as sale_type
-        FROM sale_overview
-        WHERE expired_date IS NOT NULL
+class SaleType(enum.IntEnum):
+    """Sale table a row came from; the value doubles as its keyset rank"""
+    RETAIL = 0
+    WHOLESALE = 1
+
+    @property
+    def label(self):
+        return self.name.lower()
+
+    @property
+    def prefix(self):
+        """Display prefix for product names, e.g. 'Retail - '"""
+        return f"{self.name.title()} - "
+
+SALE_TYPES = tuple(SaleType)
+
+# (table, sale type); the sale type's value is its keyset rank, which breaks
+# expired_date ties between the two tables so (expired_date, rank, sale_id)
+# is a total order
+SALE_TABLES = (
+    ('sale_overview', SaleType.RETAIL),
+    ('ws_sale_overview', SaleType.WHOLESALE),
+)
+
+# Leading columns of every scan that builds SaleRow; duration and renew
+# follow them in the renewal scans
+SALE_ROW_COLUMNS = "sale_id, sale_product, customer, email, purchased_date, expired_date"
+
+class SaleRow:
+    """One subscription row from the expiry and renewal scans
+
+    Built from a plain cursor tuple (sale_type, *SALE_ROW_COLUMNS[, duration,
+    renew]) instead of a per-row dict. days_left and next_due are filled in
+    by the scan that keeps the row.
+    """
+    __slots__ = (
+        'sale_type', 'sale_id', 'sale_product', 'customer', 'email',
+        'purchased_date', 'expired_date', 'duration', 'renew', 'days_left', 'next_due',
+    )
+
+    def __init__(self, sale_type, sale_id, sale_product, customer, email,
+                 purchased_date, expired_date, duration=None, renew=None):
+        self.sale_type = SALE_TYPES[sale_type]
+        self.sale_id = sale_id
+        self.sale_product = sale_product
+        self.customer = customer
+        self.email = email
+        self.purchased_date = purchased_date
+        self.expired_date = expired_date
+        self.duration = duration
+        self.renew = renew
+        self.days_left = None
+        self.next_due = None
+
+    @property
+    def display_product(self):
+        return self.sale_type.prefix + self.sale_product
+
+    def __repr__(self):
+        return f"SaleRow({self.sale_type.label} #{self.sale_id} {self.sale_product!r} expires {self.expired_date})"
+
+def sale_rows(rows):
+    """SaleRow objects for plain cursor tuples"""
+    return [SaleRow(*row) for row in rows]
+
+def sale_scan_key(row):
+    """(expired_date, rank, sale_id) of a (sale_type, *SALE_ROW_COLUMNS, ...) cursor tuple"""
+    return (row[6], row[0], row[1])
+
+async def fetch_merged(branches, key, limit=None, reverse=False, dictionary=False, name='query'):
+    """Run per-table queries concurrently and heap-merge their results
+
+    Every (query, params) branch must already come back sorted by key (in
+    reverse when reverse is set), so each table is read in index order and
+    MySQL never builds a UNION temporary table or filesorts it. Stops after
+    limit merged rows.
+    """
+    results = await asyncio.gather(*(
+        execute_query(query, params, dictionary=dictionary, name=name) for query, params in branches
+    ))
+    return list(itertools.islice(heapq.merge(*results, key=key, reverse=reverse), limit))
+
+async def merge_query_streams(branches, key, chunk_size=STREAM_CHUNK_SIZE, name='query'):
+    """Yield the rows of several key-sorted queries as one sorted stream of chunks
+
+    Each (query, params) branch streams from its own pooled connection and
+    a heap holds the next row of each, so only a chunk per branch is in
+    memory. Closing the generator early stops every scan.
+    """
+    async with contextlib.AsyncExitStack() as stack:
+        streams = [
+            await stack.enter_async_context(contextlib.aclosing(
+                stream_query(query, params, chunk_size=chunk_size, name=name)
+            ))
+            for query, params in branches
+        ]
+        buffers = [deque() for _ in streams]
+        
+        async def next_row(i):
+            if not buffers[i]:
+                try:
+                    buffers[i].extend(await anext(streams[i]))
+                except StopAsyncIteration:
+                    return None
+            return buffers[i].popleft()
         
-        UNION ALL
+        heap = []
+        for i in range(len(streams)):
+            row = await next_row(i)
+            if row is not None:
+                heap.append((key(row), i, row))
+        heapq.heapify(heap)
         
-        SELECT 
-            CONCAT('Wholesale - ', sale_product) as sale_product, 
-            customer, 
-            email, 
-            purchased_date, 
-            expired_date,
-            'wholesale' as sale_type
-        FROM ws_sale_overview
-        WHERE expired_date IS NOT NULL
-        
-        ORDER BY expired_date ASC
+        chunk = []
+        while heap:
+            _, i, row = heap[0]
+            chunk.append(row)
+            following = await next_row(i)
+            if following is None:
+                heapq.heappop(heap)
+            else:
+                heapq.heapreplace(heap, (key(following), i, following))
+            if len(chunk) == chunk_size:
+                yield chunk
+                chunk = []
+        if chunk:
+            yield chunk
+
+def expiring_soon_queries(horizon_days=EXPIRING_HORIZON_DAYS, anchor_date=None):
+    """Per-table (SQL, params) for sales expiring within horizon_days of Bangkok today
+
+    Each branch comes back in sale_scan_key order; merge them with
+    fetch_merged or merge_query_streams for the soonest-first list.
     """
-    
+    start_date = anchor_date or get_bangkok_today()
+    end_date = start_date + timedelta(days=horizon_days)
+    window = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+
+    # BETWEEN on expired_date lets each branch use idx_*_expired_date as a
+    # range scan instead of reading every subscription ever sold; the index
+    # carries sale_id, so the ORDER BY is satisfied without a filesort
+    return [(f"""
+        SELECT 
+            {rank:d} as sale_type,
+            {SALE_ROW_COLUMNS}
+        FROM {table}
+        WHERE expired_date BETWEEN %s AND %s
+        ORDER BY expired_date, sale_id
+    """, window) for table, rank in SALE_TABLES]
+
+async def get_expiring_soon_products(horizon_days=EXPIRING_HORIZON_DAYS, anchor_date=None):
+    """Get products expiring within horizon_days of Bangkok today from both retail and wholesale tables"""
+    branches = expiring_soon_queries(horizon_days, anchor_date)
     try:
-        return execute_query(query, dictionary=True)
+        return sale_rows(await fetch_merged(branches, sale_scan_key, name='expiring_scan'))
     except Exception as e:
         logger.error(f"Error in get_expiring_soon_products: {e}")
         return []
 
+async def stream_expiring_soon_products(horizon_days=EXPIRING_HORIZON_DAYS, anchor_date=None):
+    """get_expiring_soon_products as a stream of SaleRow chunks"""
+    branches = expiring_soon_queries(horizon_days, anchor_date)
+    async with contextlib.aclosing(merge_query_streams(branches, sale_scan_key, name='expiring_stream')) as chunks:
+        async for rows in chunks:
+            yield sale_rows(rows)
+
 def calculate_expired_date(purchased_date, duration_months):
     """Calculate expired date based on purchase date and duration"""
     try:
@@ -390,7 +1336,79 @@ def calculate_expired_date(purchased_date, duration_months):
         logger.error(f"Error calculating expired date: {e}")
         return None
 
-def save_sale(data):
+ROLLUP_INCREMENT_QUERY = """
+    INSERT INTO sales_daily_rollup (sale_date, sale_type, total_sales, total_profit, order_count)
+    VALUES (%s, %s, %s, %s, %s)
+    ON DUPLICATE KEY UPDATE
+    total_sales = total_sales + VALUES(total_sales),
+    total_profit = total_profit + VALUES(total_profit),
+    order_count = order_count + VALUES(order_count)
+"""
+
+RETAIL_INSERT_QUERY = """
+    INSERT INTO sale_overview
+    (sale_product, duration, renew, customer, email, purchased_date, expired_date, manager, note, price, profit)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+WHOLESALE_INSERT_QUERY = """
+    INSERT INTO ws_sale_overview
+    (sale_product, duration, quantity, renew, customer, email, purchased_date, expired_date, manager, note, price, profit)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
+"""
+
+def sale_insert_params(data):
+    """INSERT parameters for a sale dict, matching RETAIL/WHOLESALE_INSERT_QUERY"""
+    if data.get('product_type') == 'wholesale':
+        return (
+            data['sale_product'], data['duration'], data.get('quantity', 1), data['renew'], data['customer'],
+            data['email'], data['purchased_date'], data['expired_date'],
+            data['manager'], data['note'], data['price'], data['profit']
+        )
+    return (
+        data['sale_product'], data['duration'], data['renew'], data['customer'],
+        data['email'], data['purchased_date'], data['expired_date'],
+        data['manager'], data['note'], data['price'], data['profit']
+    )
+
+def sale_table_type(data):
+    """'wholesale' or 'retail': which sale table a sale dict belongs to"""
+    return 'wholesale' if data.get('product_type') == 'wholesale' else 'retail'
+
+def fill_expired_dates(sales):
+    """Fill in missing expired_date values, computing each (purchase date, duration) pair once"""
+    expiry_dates = {}
+    for data in sales:
+        if not data.get('expired_date'):
+            key = (data['purchased_date'], data['duration'])
+            if key not in expiry_dates:
+                expiry_dates[key] = calculate_expired_date(*key)
+            data['expired_date'] = expiry_dates[key]
+
+def sale_batch_statements(sale_type, batch):
+    """Transaction statements for a batch of same-table sales: one multi-row INSERT plus rollup increments"""
+    insert_query = WHOLESALE_INSERT_QUERY if sale_type == 'wholesale' else RETAIL_INSERT_QUERY
+    rollup = {}
+    for data in batch:
+        totals = rollup.setdefault(data['purchased_date'], [0, 0, 0])
+        totals[0] += data['price']
+        totals[1] += data['profit']
+        totals[2] += 1
+    return [
+        (insert_query, [sale_insert_params(data) for data in batch]),
+        (ROLLUP_INCREMENT_QUERY, [(day, sale_type, *totals) for day, totals in rollup.items()]),
+    ]
+
+async def commit_sale_batch(sale_type, batch, prepared=False, name='sale_insert'):
+    """Commit a batch of same-table sales, number them and add them to the digest snapshot"""
+    first_id = await execute_transaction(sale_batch_statements(sale_type, batch), prepared=prepared, name=name)
+    # A multi-row INSERT hands out consecutive ids unless another writer
+    # interleaves; the ids only order snapshot entries until the next rebuild
+    for offset, data in enumerate(batch):
+        data['sale_id'] = first_id + offset if first_id else None
+    record_saved_sales(sale_type, batch)
+
+async def save_sale(data):
     """Save a new sale to either sale_overview or ws_sale_overview table based on product type"""
     try:
         # Calculate expired_date if not provided
@@ -400,259 +1418,1074 @@ def save_sale(data):
                 return False
             data['expired_date'] = expired_date
         
-        # Determine which table to use based on product type
-        table_name = "ws_sale_overview" if data.get('product_type') == 'wholesale' else "sale_overview"
-        
-        if data.get('product_type') == 'wholesale':
-            # Use quantity directly from data
-            quantity = data.get('quantity', 1)
-            
-            query = f"""
-                INSERT INTO {table_name}
-                (sale_product, duration, quantity, renew, customer, email, purchased_date, expired_date, manager, note, price, profit)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            params = (
-                data['sale_product'], data['duration'], quantity, data['renew'], data['customer'],
-                data['email'], data['purchased_date'], data['expired_date'],
-                data['manager'], data['note'], data['price'], data['profit']
-            )
-        else:
-            # Retail sales don't have quantity field
-            query = f"""
-                INSERT INTO {table_name}
-                (sale_product, duration, renew, customer, email, purchased_date, expired_date, manager, note, price, profit)
-                VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s, %s)
-            """
-            params = (
-                data['sale_product'], data['duration'], data['renew'], data['customer'],
-                data['email'], data['purchased_date'], data['expired_date'],
-                data['manager'], data['note'], data['price'], data['profit']
-            )
+        # Under write-behind the sale rides along in the next batch commit
+        if WRITE_BEHIND and sale_writer.accepting:
+            return await sale_writer.submit(data)
         
-        execute_query(query, params, fetch_type=None)
+        await commit_sale_batch(sale_table_type(data), [data], prepared=True)
         return True
         
     except Exception as e:
         logger.error(f"Error in save_sale: {e}")
         return False
 
-def get_renewals_due_soon():
-    """Get subscriptions that need renewal within 3 days from both retail and wholesale tables"""
-    query = """
-        SELECT 
-            CONCAT('Retail - ', sale_product) as sale_product, 
-            customer, 
-            email, 
-            purchased_date, 
-            expired_date, 
-            duration, 
-            renew,
-            'retail' as sale_type
-        FROM sale_overview
-        WHERE renew > 0 AND expired_date IS NOT NULL
+async def save_sales_bulk(sales):
+    """Save many validated sales: one executemany INSERT and one commit per sale table
+
+    Returns {'retail': count or None, 'wholesale': count or None}, where None
+    means that table's transaction failed and was rolled back.
+    """
+    fill_expired_dates(sales)
+    
+    results = {}
+    for sale_type in ('retail', 'wholesale'):
+        batch = [data for data in sales if sale_table_type(data) == sale_type]
+        if not batch:
+            continue
         
-        UNION ALL
+        try:
+            await commit_sale_batch(sale_type, batch, name='sale_bulk_insert')
+            results[sale_type] = len(batch)
+        except Exception as e:
+            logger.error(f"Error in save_sales_bulk ({sale_type}): {e}")
+            results[sale_type] = None
+    
+    return results
+
+class SaleWriteBehind:
+    """Write-behind queue that coalesces save_sale calls into batch commits
+
+    Each sale table has a pending queue drained by one worker task. The
+    worker commits a batch as soon as WRITE_BEHIND_MAX_ROWS sales are waiting
+    or WRITE_BEHIND_MAX_DELAY_MS after it started waiting, whichever comes
+    first. Callers wait on a future that resolves once their batch has
+    committed; if a batch fails, its sales are retried one by one so a single
+    bad row only fails its own caller.
+    """
+
+    def __init__(self):
+        self.pending = {}
+        self.wakeups = {}
+        self.workers = {}
+        self.accepting = True
+        self.batches = 0
+        self.rows = 0
+        self.failed = 0
+        self.batch_sizes = deque(maxlen=500)
+
+    def submit(self, data):
+        """Queue a sale (expired_date already set); returns a future resolving to True/False"""
+        future = asyncio.get_running_loop().create_future()
+        sale_type = sale_table_type(data)
+        pending = self.pending.setdefault(sale_type, deque())
+        pending.append((data, future))
         
-        SELECT 
-            CONCAT('Wholesale - ', sale_product) as sale_product, 
-            customer, 
-            email, 
-            purchased_date, 
-            expired_date, 
-            duration, 
-            renew,
-            'wholesale' as sale_type
-        FROM ws_sale_overview
-        WHERE renew > 0 AND expired_date IS NOT NULL
+        if sale_type not in self.workers:
+            self.wakeups[sale_type] = asyncio.Event()
+            self.workers[sale_type] = asyncio.create_task(self._drain(sale_type, pending))
+        elif len(pending) >= WRITE_BEHIND_MAX_ROWS:
+            self.wakeups[sale_type].set()
+        return future
+
+    async def _drain(self, sale_type, pending):
+        # The worker exits once its queue is empty; submit() starts a new one
+        wakeup = self.wakeups[sale_type]
+        while pending:
+            if len(pending) < WRITE_BEHIND_MAX_ROWS and self.accepting:
+                wakeup.clear()
+                try:
+                    await asyncio.wait_for(wakeup.wait(), WRITE_BEHIND_MAX_DELAY_MS / 1000)
+                except asyncio.TimeoutError:
+                    pass
+            
+            batch = [pending.popleft() for _ in range(min(len(pending), WRITE_BEHIND_MAX_ROWS))]
+            await self._flush(sale_type, batch)
+        del self.workers[sale_type]
+
+    async def _flush(self, sale_type, batch):
+        sales = [data for data, future in batch]
+        try:
+            await commit_sale_batch(sale_type, sales, name='sale_write_behind')
+            results = [True] * len(batch)
+        except Exception as e:
+            logger.error(f"Write-behind batch of {len(batch)} {sale_type} sales failed: {e}")
+            results = []
+            for data in sales:
+                try:
+                    await commit_sale_batch(sale_type, [data], prepared=True)
+                    results.append(True)
+                except Exception as e:
+                    logger.error(f"Error saving {sale_type} sale for {data.get('customer')}: {e}")
+                    results.append(False)
         
-        ORDER BY expired_date ASC
+        self.batches += 1
+        self.rows += results.count(True)
+        self.failed += results.count(False)
+        self.batch_sizes.append(len(batch))
+        for (data, future), saved in zip(batch, results):
+            if not future.done():
+                future.set_result(saved)
+
+    async def close(self):
+        """Stop batching new sales and wait until everything queued has committed"""
+        self.accepting = False
+        for wakeup in self.wakeups.values():
+            wakeup.set()
+        workers = list(self.workers.values())
+        if workers:
+            logger.info(f"Draining {self.queued()} queued sales")
+            await asyncio.gather(*workers)
+
+    def queued(self):
+        """Number of sales waiting for a batch commit"""
+        return sum(len(pending) for pending in self.pending.values())
+
+    def stats(self):
+        """Queue depth, commit counters and recent batch size"""
+        sizes = self.batch_sizes
+        return {
+            'queued': self.queued(),
+            'batches': self.batches,
+            'rows': self.rows,
+            'failed': self.failed,
+            'batch_rows_avg': sum(sizes) / len(sizes) if sizes else 0,
+        }
+
+sale_writer = SaleWriteBehind()
+
+async def drain_sale_writer(app):
+    """Application post_stop hook: commit any sales still queued for write-behind"""
+    await sale_writer.close()
+
+def renewal_candidate_filter(today):
+    """SQL WHERE clause and params that keep only rows that could be due for renewal soon"""
+    window_days = [today + timedelta(days=offset) for offset in range(RENEWAL_HORIZON_DAYS + 1)]
+    expiry_floor = (today + timedelta(days=RENEWAL_EXPIRY_GRACE_DAYS)).strftime('%Y-%m-%d')
+
+    # Coarse SQL prefilter: a due date keeps the purchase day-of-month unless it
+    # was clamped at month end, so only purchase days in the window (or 29-31)
+    # can land inside it. Rows already expiring soon are shown by /expiring.
+    day_placeholders = ", ".join(["%s"] * len(window_days))
+    candidate_filter = f"""
+        renew > 0 AND renew < duration
+        AND expired_date > %s
+        AND (DAY(purchased_date) IN ({day_placeholders}) OR DAY(purchased_date) > 28)
+    """
+    return candidate_filter, (expiry_floor, *[d.day for d in window_days])
+
+def renewals_scan_queries(today):
+    """Per-table (SQL, params) for renewal candidates
+
+    Renewals are ordered by due date after evaluation, so the candidate
+    scans carry no ORDER BY and can simply be read one after the other.
     """
+    candidate_filter, filter_params = renewal_candidate_filter(today)
+
+    return [(f"""
+        SELECT 
+            {rank:d} as sale_type,
+            {SALE_ROW_COLUMNS},
+            duration, 
+            renew
+        FROM {table}
+        WHERE {candidate_filter}
+    """, filter_params) for table, rank in SALE_TABLES]
+
+async def get_renewals_due_soon():
+    """Get subscriptions that need renewal within 3 days from both retail and wholesale tables"""
+    today = get_bangkok_today()
+    branches = renewals_scan_queries(today)
     
     try:
-        results = execute_query(query, dictionary=True)
-        
-        renewals = []
-        today = get_bangkok_today()
-        
-        for row in results:
-            try:
-                # Parse dates
-                purchased_date = parse_date_safe(row['purchased_date'])
-                expired_date = parse_date_safe(row['expired_date'])
-                
-                renew_months = int(row['renew'])
-                duration = int(row['duration'])
-                
-                # Skip if renew >= duration (no renewals needed)
-                if renew_months >= duration:
-                    continue
-                
-                # Calculate next due date
-                next_due = calculate_next_due_date(purchased_date, renew_months, today)
-                if not next_due:
-                    continue
-                
-                # Check if next due is within 2 days
-                days_left = (next_due - today).days
-                if 0 <= days_left <= 2:
-                    # Check if it's not already expiring soon
-                    days_to_expiry = (expired_date - today).days
-                    if days_to_expiry > 3:  # Not expiring soon
-                        renewals.append({
-                            'sale_product': row['sale_product'],
-                            'customer': row['customer'],
-                            'email': row['email'],
-                            'purchased_date': purchased_date,
-                            'expired_date': expired_date,
-                            'next_due': next_due,
-                            'days_left': days_left,
-                            'renew': renew_months,
-                            'sale_type': row['sale_type']
-                        })
-                        
-            except Exception as e:
-                logger.error(f"Error processing renewal row: {row} -> {e}")
-                continue
-        
-        # Sort by days left, then by next due date
-        renewals.sort(key=lambda x: (x['days_left'], x['next_due']))
-        return renewals
+        results = await asyncio.gather(*(
+            execute_query(query, params, name='renewals_scan') for query, params in branches
+        ))
+        return evaluate_renewal_rows(sale_rows(itertools.chain.from_iterable(results)), today)
         
     except Exception as e:
         logger.error(f"Error in get_renewals_due_soon: {e}")
         return []
 
-def calculate_next_due_date(purchased_date, renew_months, base_date):
-    """Calculate next due date for renewal"""
+async def scan_renewals_due_soon(today):
+    """Renewals due soon after today from a streamed candidate scan, unsorted; raises on database errors
+
+    Candidates are evaluated a chunk at a time, so memory holds one chunk
+    plus the renewals found so far rather than every candidate row.
+    """
+    renewals = []
+    for query, params in renewals_scan_queries(today):
+        async with contextlib.aclosing(stream_query(query, params, name='renewals_stream')) as chunks:
+            async for rows in chunks:
+                renewals.extend(evaluate_renewal_rows(sale_rows(rows), today))
+    return renewals
+
+async def stream_renewals_due_soon():
+    """get_renewals_due_soon over a streamed candidate scan"""
     try:
-        # Start from purchase date
-        due_date = purchased_date
-        
-        # Keep adding renew_months until we're at or after base_date
-        while due_date < base_date:
-            # Add months to due_date
-            year = due_date.year
-            month = due_date.month + renew_months
-            day = due_date.day
-            
-            # Handle year rollover
-            while month > 12:
-                year += 1
-                month -= 12
-            
-            # Handle end-of-month cases
-            try:
-                due_date = due_date.replace(year=year, month=month, day=day)
-            except ValueError:
-                # If the day doesn't exist in the target month, use the last day
-                if month == 12:
-                    next_month = datetime(year + 1, 1, 1)
-                else:
-                    next_month = datetime(year, month + 1, 1)
-                due_date = (next_month - timedelta(days=1)).date()
-        
-        return due_date
-        
+        renewals = await scan_renewals_due_soon(get_bangkok_today())
     except Exception as e:
-        logger.error(f"Error calculating next due date: {e}")
-        return None
+        logger.error(f"Error in stream_renewals_due_soon: {e}")
+        return []
+    
+    renewals.sort(key=lambda x: (x.days_left, x.next_due))
+    return renewals
 
-def process_expiring_data(data, max_days=1):
-    """Process expiring data and filter by days left"""
-    today = get_bangkok_today()
-    soon = []
+def evaluate_renewal_rows(rows, today):
+    """Renewals due among candidate rows, on the batch path when there are enough of them"""
+    if use_vectorized_batch(rows):
+        return process_renewal_rows_vectorized(rows, today)
+    return process_renewal_rows(rows, today)
 
-    for row in data:
+def use_vectorized_batch(rows):
+    """Whether a result set is large enough to take the NumPy/pandas batch path"""
+    return VECTORIZED_BATCH and len(rows) >= VECTORIZED_BATCH_MIN_ROWS
+
+def process_renewal_rows(results, today):
+    """Scalar renewal evaluation: one calculate_next_due_date call per row"""
+    renewals = []
+
+    for row in results:
         try:
-            expired_date = parse_date_safe(row["expired_date"])
-            days_left = (expired_date - today).days
-            
-            if 0 <= days_left <= max_days:
-                row["days_left"] = days_left
-                row["expired_date"] = expired_date.strftime("%Y-%m-%d")
-                soon.append(row)
-        except Exception as e:
-            logger.error(f"Error parsing expiring row: {row} -> {e}")
-            continue
+            # Parse dates
+            purchased_date = parse_date_safe(row.purchased_date)
+            expired_date = parse_date_safe(row.expired_date)
 
-    return sorted(soon, key=lambda x: x["days_left"])
+            renew_months = int(row.renew)
+            duration = int(row.duration)
 
-def format_expiring_message(items, title="Expiring Products"):
-    """Format expiring items into a message - 15 products per message"""
-    if not items:
-        return [f"No {title.lower()} within 2 days."]
+            # Skip if renew >= duration (no renewals needed)
+            if renew_months >= duration:
+                continue
+
+            # Calculate next due date
+            next_due = calculate_next_due_date(purchased_date, renew_months, today)
+            if not next_due:
+                continue
+
+            # Check if next due is within 2 days
+            days_left = (next_due - today).days
+            if 0 <= days_left <= RENEWAL_HORIZON_DAYS:
+                # Check if it's not already expiring soon
+                days_to_expiry = (expired_date - today).days
+                if days_to_expiry > RENEWAL_EXPIRY_GRACE_DAYS:  # Not expiring soon
+                    row.purchased_date = purchased_date
+                    row.expired_date = expired_date
+                    row.next_due = next_due
+                    row.days_left = days_left
+                    row.renew = renew_months
+                    renewals.append(row)
+
+        except Exception as e:
+            logger.error(f"Error processing renewal row: {row} -> {e}")
+            continue
+
+    # Sort by days left, then by next due date
+    renewals.sort(key=lambda x: (x.days_left, x.next_due))
+    return renewals
+
+def process_renewal_rows_vectorized(results, today):
+    """Columnar renewal evaluation producing the same rows as process_renewal_rows"""
+    purchased = _to_day_array([row.purchased_date for row in results])
+    expired = _to_day_array([row.expired_date for row in results])
+    renew = _to_float_array([row.renew for row in results])
+    duration = _to_float_array([row.duration for row in results])
     
-    messages = []
-    products_per_message = 15
+    valid = ~(np.isnat(purchased) | np.isnat(expired) | np.isnan(renew) | np.isnan(duration))
+    if not valid.all():
+        logger.error(f"Skipping {int((~valid).sum())} renewal rows with unparseable dates or periods")
+    valid &= renew < duration
     
-    for i in range(0, len(items), products_per_message):
-        batch = items[i:i + products_per_message]
-        message_number = (i // products_per_message) + 1
-        
-        if message_number == 1:
-            current_message = f"*{title}:*\n\n"
+    rows = np.flatnonzero(valid)
+    purchased, expired = purchased[rows], expired[rows]
+    renew = renew[rows].astype('int64')
+    base = np.datetime64(today, 'D')
+    
+    # Same jump as calculate_next_due_date: first step whose month is not before today
+    purchase_month = purchased.astype('datetime64[M]')
+    day_offset = (purchased - purchase_month.astype('datetime64[D]')).astype('int64')
+    start_index = purchase_month.astype('int64')
+    base_index = np.datetime64(today, 'M').astype('int64')
+    period = np.maximum(renew, 1)
+    steps = np.maximum(1, -((start_index - base_index) // period))
+    
+    def step_dates(step_counts):
+        months = (start_index + step_counts * period).astype('datetime64[M]')
+        return months.astype('datetime64[D]') + day_offset
+    
+    next_due = step_dates(steps)
+    next_due = np.where(next_due < base, step_dates(steps + 1), next_due)
+    next_due = np.where(renew <= 0, np.datetime64('NaT'), next_due)
+    next_due = np.where(purchased >= base, purchased, next_due)
+    
+    # Purchase days 29-31 can hit the sticky month-end clamp; those few rows
+    # take the scalar engine rather than a vectorized calendar walk
+    for i in np.flatnonzero((day_offset >= 28) & (purchased < base) & (renew > 0)):
+        due = calculate_next_due_date(purchased[i].item(), int(renew[i]), today)
+        next_due[i] = np.datetime64(due, 'D') if due else np.datetime64('NaT')
+    
+    days_left = (next_due - base).astype('int64')
+    days_to_expiry = (expired - base).astype('int64')
+    keep = (
+        ~np.isnat(next_due)
+        & (days_left >= 0) & (days_left <= RENEWAL_HORIZON_DAYS)
+        & (days_to_expiry > RENEWAL_EXPIRY_GRACE_DAYS)
+    )
+    
+    renewals = []
+    for i in np.flatnonzero(keep):
+        row = results[rows[i]]
+        row.purchased_date = purchased[i].item()
+        row.expired_date = expired[i].item()
+        row.next_due = next_due[i].item()
+        row.days_left = int(days_left[i])
+        row.renew = int(renew[i])
+        renewals.append(row)
+    
+    renewals.sort(key=lambda x: (x.days_left, x.next_due))
+    return renewals
+
+def _to_day_array(values):
+    """Parse a column of dates/datetimes/'YYYY-MM-DD' strings into datetime64[D] (NaT on failure)"""
+    parsed = pd.to_datetime(values, errors='coerce', format='mixed')
+    return parsed.to_numpy(dtype='datetime64[ns]').astype('datetime64[D]')
+
+def _to_float_array(values):
+    """Parse a column of numbers into float64 (NaN on failure)"""
+    return pd.to_numeric(pd.Series(values, dtype='object'), errors='coerce').to_numpy(dtype='float64')
+
+def _shortest_month_on_schedule(start_index, renew_months, steps):
+    """Shortest month length among renewal steps 1..steps (months counted as year * 12 + month - 1)"""
+    shortest = 31
+    feb_step = None
+    
+    # Month-of-year repeats at least every 12 steps; only February depends on the year
+    for step in range(1, min(steps, 12) + 1):
+        year, month_index = divmod(start_index + step * renew_months, 12)
+        if month_index == 1:
+            feb_step = feb_step or step
         else:
-            current_message = f"*{title} (Part {message_number}):*\n\n"
+            shortest = min(shortest, calendar.monthrange(year, month_index + 1)[1])
+    
+    if feb_step:
+        # Walk the Februaries on the schedule until a non-leap one pins the day to 28
+        feb_period = 12 // math.gcd(renew_months, 12)
+        for step in range(feb_step, steps + 1, feb_period):
+            year = (start_index + step * renew_months) // 12
+            if not calendar.isleap(year):
+                return 28
+        shortest = 29
+    
+    return shortest
+
+def _renewal_step_date(purchased_date, start_index, renew_months, steps):
+    """Date of the given renewal step, applying the sticky end-of-month clamp"""
+    day = purchased_date.day
+    if day > 28:
+        # Once a step is clamped (Jan 31 -> Feb 28) later steps keep the shorter day
+        day = min(day, _shortest_month_on_schedule(start_index, renew_months, steps))
+    year, month_index = divmod(start_index + steps * renew_months, 12)
+    return date(year, month_index + 1, day)
+
+def calculate_next_due_date(purchased_date, renew_months, base_date):
+    """Calculate next due date for renewal"""
+    try:
+        if purchased_date >= base_date:
+            return purchased_date
+        if renew_months <= 0:
+            return None
         
-        for idx, item in enumerate(batch, i + 1):
-            days_text = "Today!" if item["days_left"] == 0 else f"{item['days_left']} day(s)"
-            
-            purchased_date = format_date_readable(item['purchased_date'])
-            expired_date = format_date_readable(item['expired_date'])
+        # Jump straight to the first step whose month is not before base_date
+        start_index = purchased_date.year * 12 + purchased_date.month - 1
+        base_index = base_date.year * 12 + base_date.month - 1
+        steps = max(1, -(-(base_index - start_index) // renew_months))
+        
+        due_date = _renewal_step_date(purchased_date, start_index, renew_months, steps)
+        if due_date < base_date:
+            # Same month as base_date but an earlier day
+            due_date = _renewal_step_date(purchased_date, start_index, renew_months, steps + 1)
+        
+        return due_date
+        
+    except Exception as e:
+        logger.error(f"Error calculating next due date: {e}")
+        return None
+
+def process_expiring_data(data, max_days=EXPIRING_HORIZON_DAYS):
+    """Process expiring data and filter by days left"""
+    if use_vectorized_batch(data):
+        return process_expiring_data_vectorized(data, max_days)
+    
+    soon = list(iter_expiring_items(data, get_bangkok_today(), max_days))
+    return sorted(soon, key=lambda x: x.days_left)
+
+def iter_expiring_items(rows, today, max_days=EXPIRING_HORIZON_DAYS):
+    """Yield rows expiring within max_days of today, with days_left set, in input order"""
+    for row in rows:
+        try:
+            expired_date = parse_date_safe(row.expired_date)
+            days_left = (expired_date - today).days
             
-            item_text = (
-                f"{idx}. Product: {escape_markdown(item['sale_product'])}\n"
-                f"Customer: `{escape_markdown(item['customer'])}`\n"
-                f"Email: `{escape_markdown(item['email'] or '-')}`\n"
-                f"{purchased_date} to {expired_date}\n"
-                f"Ends in: {days_text}\n\n"
+            if 0 <= days_left <= max_days:
+                row.days_left = days_left
+                row.expired_date = expired_date
+                yield row
+        except Exception as e:
+            logger.error(f"Error parsing expiring row: {row} -> {e}")
+            continue
+
+def process_expiring_data_vectorized(data, max_days=EXPIRING_HORIZON_DAYS):
+    """Columnar variant of process_expiring_data with identical output"""
+    base = np.datetime64(get_bangkok_today(), 'D')
+    expired = _to_day_array([row.expired_date for row in data])
+    if np.isnat(expired).any():
+        logger.error(f"Skipping {int(np.isnat(expired).sum())} expiring rows with unparseable dates")
+    
+    days_left = (expired - base).astype('int64')
+    keep = ~np.isnat(expired) & (days_left >= 0) & (days_left <= max_days)
+    
+    soon = []
+    for i in np.flatnonzero(keep):
+        row = data[i]
+        row.days_left = int(days_left[i])
+        row.expired_date = expired[i].item()
+        soon.append(row)
+
+    return sorted(soon, key=lambda x: x.days_left)
+
+def _keyset_condition(rank, cursor, backward):
+    """SQL fragment selecting a table's rows past an (expired_date, rank, sale_id) cursor"""
+    if cursor is None:
+        return "", ()
+    
+    cursor_date, cursor_rank, cursor_id = cursor
+    op = '<' if backward else '>'
+    if rank == cursor_rank:
+        return (
+            f"AND (expired_date {op} %s OR (expired_date = %s AND sale_id {op} %s))",
+            (cursor_date, cursor_date, cursor_id)
+        )
+    # Rows of the other table on the cursor date sit entirely before or after it
+    if (rank > cursor_rank) != backward:
+        return f"AND expired_date {op}= %s", (cursor_date,)
+    return f"AND expired_date {op} %s", (cursor_date,)
+
+def sale_keyset_queries(columns, where, where_params, cursor=None, backward=False, limit=LIST_PAGE_SIZE):
+    """Per-table (SQL, params) for up to limit rows past a keyset cursor, in scan order
+
+    idx_*_expired_date carries the primary key, so each branch is an index
+    range scan that stops after limit rows; columns must continue
+    SALE_ROW_COLUMNS after sale_product.
+    """
+    order = 'DESC' if backward else 'ASC'
+    branches = []
+    
+    for table, rank in SALE_TABLES:
+        keyset_sql, keyset_params = _keyset_condition(rank, cursor, backward)
+        branches.append((f"""
+            SELECT 
+                {rank:d} as table_rank,
+                sale_id,
+                sale_product,
+                {columns}
+            FROM {table}
+            WHERE {where} {keyset_sql}
+            ORDER BY expired_date {order}, sale_id {order}
+            LIMIT %s
+        """, (*where_params, *keyset_params, limit)))
+    return branches
+
+async def fetch_sale_keyset_page(columns, where, where_params, cursor=None, backward=False, limit=LIST_PAGE_SIZE, name='keyset_page'):
+    """Fetch up to limit rows from both sale tables past a keyset cursor, in scan order
+
+    Rows come back as SaleRow ordered by (expired_date, rank, sale_id),
+    descending when scanning backward.
+    """
+    branches = sale_keyset_queries(columns, where, where_params, cursor, backward, limit)
+    return sale_rows(await fetch_merged(branches, sale_scan_key, limit, reverse=backward, name=name))
+
+def sale_row_key(row):
+    """Keyset cursor (expired_date, rank, sale_id) of a row from fetch_sale_keyset_page"""
+    return (parse_date_safe(row.expired_date).strftime('%Y-%m-%d'), int(row.sale_type), int(row.sale_id))
+
+async def get_expiring_page(cursor=None, backward=False, page_size=LIST_PAGE_SIZE):
+    """One page of expiring products: (items, first key, last key, more rows in scan direction)"""
+    if DIGEST_SNAPSHOT:
+        return (await get_digest_snapshot()).page('exp', cursor, backward, page_size)
+    
+    start_date = get_bangkok_today()
+    end_date = start_date + timedelta(days=EXPIRING_HORIZON_DAYS)
+    window = (start_date.strftime('%Y-%m-%d'), end_date.strftime('%Y-%m-%d'))
+    
+    rows = await fetch_sale_keyset_page(
+        "customer, email, purchased_date, expired_date",
+        "expired_date BETWEEN %s AND %s", window,
+        cursor, backward, page_size + 1, name='expiring_page'
+    )
+    has_more = len(rows) > page_size
+    rows = rows[:page_size]
+    if backward:
+        rows.reverse()
+    if not rows:
+        return [], None, None, False
+    
+    first_key, last_key = sale_row_key(rows[0]), sale_row_key(rows[-1])
+    return process_expiring_data(rows), first_key, last_key, has_more
+
+async def get_renewals_page(cursor=None, backward=False, page_size=LIST_PAGE_SIZE):
+    """One page of renewals: (items, first key, last key, more items in scan direction)
+
+    Renewal eligibility is decided in Python, so candidates are scanned in
+    keyset chunks until the page (plus one look-ahead item) is filled.
+    """
+    if DIGEST_SNAPSHOT:
+        return (await get_digest_snapshot()).page('ren', cursor, backward, page_size)
+    
+    today = get_bangkok_today()
+    candidate_filter, filter_params = renewal_candidate_filter(today)
+    items, keys = [], []
+    has_more = False
+    
+    while not has_more:
+        rows = await fetch_sale_keyset_page(
+            "customer, email, purchased_date, expired_date, duration, renew",
+            candidate_filter, filter_params,
+            cursor, backward, RENEWAL_SCAN_CHUNK, name='renewals_page'
+        )
+        for row in rows:
+            cursor = sale_row_key(row)
+            matched = process_renewal_rows([row], today)
+            if not matched:
+                continue
+            if len(items) == page_size:
+                has_more = True
+                break
+            items.append(matched[0])
+            keys.append(cursor)
+        if len(rows) < RENEWAL_SCAN_CHUNK:
+            break
+    
+    if backward:
+        items.reverse()
+        keys.reverse()
+    if not items:
+        return [], None, None, False
+    return items, keys[0], keys[-1], has_more
+
+class DigestSnapshot:
+    """Expiring and renewal lists for one Bangkok day, with their rendered digest
+
+    Both lists are held in keyset order so list pages slice them by cursor
+    instead of querying. Sales saved by the bot are added as they commit;
+    anything else that changes the sale tables drops the snapshot.
+    """
+
+    def __init__(self, day, expiring, renewals):
+        self.day = day
+        self.views = {
+            'exp': self._keyed(expiring),
+            'ren': self._keyed(renewals),
+        }
+        self.messages = None
+        self.built_at = time.monotonic()
+        self.hits = 0
+        self.added = 0
+
+    @staticmethod
+    def _keyed(rows):
+        rows = sorted(rows, key=sale_row_key)
+        return rows, [sale_row_key(row) for row in rows]
+
+    def page(self, view, cursor, backward, page_size):
+        """Same (items, first key, last key, has_more) contract as the keyset page loaders"""
+        self.hits += 1
+        rows, keys = self.views[view]
+        if backward:
+            end = bisect.bisect_left(keys, cursor)
+            start = max(0, end - page_size)
+            has_more = start > 0
+        else:
+            start = bisect.bisect_right(keys, cursor) if cursor else 0
+            end = start + page_size
+            has_more = end < len(rows)
+        if start >= min(end, len(rows)):
+            return [], None, None, False
+        end = min(end, len(rows))
+        return rows[start:end], keys[start], keys[end - 1], has_more
+
+    def digest_messages(self):
+        """The daily channel digest, rendered once and reused until the snapshot changes"""
+        if self.messages is None:
+            renewals = sorted(self.views['ren'][0], key=lambda x: (x.days_left, x.next_due))
+            self.messages = (
+                format_expiring_message(self.views['exp'][0])
+                + format_renewals_message(renewals)
             )
+        return self.messages
+
+    def add(self, view, row):
+        """Insert a newly saved row in keyset order, unless the scan already found it"""
+        rows, keys = self.views[view]
+        key = sale_row_key(row)
+        index = bisect.bisect_right(keys, key)
+        if index and keys[index - 1] == key:
+            return
+        rows.insert(index, row)
+        keys.insert(index, key)
+        self.messages = None
+        self.added += 1
+
+    def stats(self):
+        return {
+            'expiring': len(self.views['exp'][0]),
+            'renewals': len(self.views['ren'][0]),
+            'age_seconds': time.monotonic() - self.built_at,
+            'hits': self.hits,
+            'added': self.added,
+        }
+
+digest_snapshot = None
+digest_snapshot_lock = asyncio.Lock()
+# While a snapshot is being built: (sale_type, batch) saved since the scan
+# started, replayed once it is installed; None when no build is running
+digest_snapshot_pending = None
+# Set when the sale tables change under a running build
+digest_snapshot_build_stale = False
+
+async def build_digest_snapshot(day):
+    """Scan both sale tables once for day's expiring and renewal lists"""
+    expiring = []
+    async with contextlib.aclosing(stream_expiring_soon_products(anchor_date=day)) as chunks:
+        async for rows in chunks:
+            expiring.extend(iter_expiring_items(rows, day))
+    renewals = await scan_renewals_due_soon(day)
+    logger.info(f"Digest snapshot for {day}: {len(expiring)} expiring, {len(renewals)} renewals")
+    return DigestSnapshot(day, expiring, renewals)
+
+async def get_digest_snapshot():
+    """Today's digest snapshot, built on first use each Bangkok day; raises on database errors"""
+    today = get_bangkok_today()
+    snapshot = digest_snapshot
+    if snapshot is not None and snapshot.day == today:
+        return snapshot
+    
+    async with digest_snapshot_lock:
+        snapshot = digest_snapshot
+        if snapshot is None or snapshot.day != today:
+            snapshot = await _build_and_install_digest_snapshot(today)
+        return snapshot
+
+async def _build_and_install_digest_snapshot(day):
+    # Sales committed while the scan runs may be missing from its result, so
+    # they are queued and replayed; add() skips any the scan did see
+    global digest_snapshot, digest_snapshot_pending, digest_snapshot_build_stale
+    digest_snapshot_pending = []
+    digest_snapshot_build_stale = False
+    try:
+        snapshot = await build_digest_snapshot(day)
+    finally:
+        pending, digest_snapshot_pending = digest_snapshot_pending, None
+    
+    if digest_snapshot_build_stale:
+        # An outside edit or delete raced the scan; serve this result once
+        # and let the next view rebuild
+        logger.info("Sale tables changed during the digest snapshot build; not caching it")
+        return snapshot
+    
+    digest_snapshot = snapshot
+    for sale_type, batch in pending:
+        record_saved_sales(sale_type, batch)
+    return digest_snapshot or snapshot
+
+def invalidate_digest_snapshot():
+    """Drop the digest snapshot; the next view rebuilds it"""
+    global digest_snapshot, digest_snapshot_build_stale
+    digest_snapshot = None
+    if digest_snapshot_pending is not None:
+        digest_snapshot_build_stale = True
+    logger.info("Digest snapshot invalidated")
+
+# The PHP API bumps 'sales' after every sale insert, edit or delete
+CACHE_INVALIDATORS['sales'] = invalidate_digest_snapshot
+
+def record_saved_sales(sale_type, batch):
+    """Add committed sales that fall in today's expiring or renewal window to the snapshot"""
+    if digest_snapshot_pending is not None:
+        digest_snapshot_pending.append((sale_type, batch))
+    snapshot = digest_snapshot
+    if snapshot is None or snapshot.day != get_bangkok_today():
+        return
+    
+    rank = SaleType.WHOLESALE if sale_type == 'wholesale' else SaleType.RETAIL
+    try:
+        for data in batch:
+            if data.get('sale_id') is None:
+                # Without an id the row cannot be placed in keyset order
+                invalidate_digest_snapshot()
+                return
             
-            current_message += item_text
-        
-        messages.append(current_message.strip())
+            def row():
+                return SaleRow(
+                    rank, data['sale_id'], data['sale_product'], data['customer'], data['email'],
+                    parse_date_safe(data['purchased_date']), parse_date_safe(data['expired_date']),
+                    data['duration'], data['renew'],
+                )
+            
+            for item in iter_expiring_items([row()], snapshot.day):
+                snapshot.add('exp', item)
+            for item in process_renewal_rows([row()], snapshot.day):
+                snapshot.add('ren', item)
+    except Exception as e:
+        # The sales are committed either way; a rebuild picks them up
+        logger.error(f"Error adding saved sales to the digest snapshot: {e}")
+        invalidate_digest_snapshot()
+
+def telegram_length(text):
+    """Message length as Telegram counts it (UTF-16 code units)"""
+    return len(text.encode('utf-16-le')) // 2
+
+def list_field(value, limit=LIST_FIELD_LIMIT):
+    """Markdown-escaped value for a list entry, shortened so one entry stays well under a message"""
+    text = str(value)
+    if len(text) > limit:
+        # Cut before escaping so no escape sequence is split
+        text = text[:limit - 1] + "…"
+    return escape_markdown(text)
+
+def _close_markdown_entities(text):
+    """Close a *, _ or ` entity left open by a cut, or drop an unfinished [link"""
+    opener = None
+    opened_at = 0
+    i = 0
+    while i < len(text):
+        char = text[i]
+        if opener == '`':
+            if char == '`':
+                opener = None
+        elif char == '\\' and opener is None:
+            i += 1
+        elif opener is None and char in '*_`[':
+            opener, opened_at = char, i
+        elif (opener == '[' and char == ']') or char == opener:
+            opener = None
+        i += 1
     
+    if opener == '[':
+        return text[:opened_at]
+    return text + opener if opener else text
+
+def _truncate_to_length(text, max_length):
+    """Cut text so its Telegram length fits max_length, marking the cut
+
+    The kept text stays valid legacy Markdown: an entity the cut leaves
+    open is closed after the marker.
+    """
+    units = text.encode('utf-16-le')[:max(0, max_length - 2) * 2]
+    # Dropping a dangling half of a surrogate pair keeps the cut valid
+    return _close_markdown_entities(units.decode('utf-16-le', errors='ignore') + "…")
+
+class MessagePacker:
+    """Incremental pack_messages for item streams
+
+    add() returns the message it completed, if any, so a caller can send
+    messages while items are still being produced; finish() flushes the last.
+    """
+
+    def __init__(self, header, limit=TELEGRAM_MESSAGE_LIMIT):
+        self.header = header
+        self.limit = limit
+        self.parts = []
+        self.size = 0
+        self.count = 0
+
+    def add(self, item):
+        completed = []
+        item_size = telegram_length(item)
+        if self.parts and self.size + item_size > self.limit:
+            completed = self.finish()
+        
+        if not self.parts:
+            heading = self.header(self.count + 1)
+            self.parts.append(heading)
+            self.size = telegram_length(heading)
+            if self.size + item_size > self.limit:
+                item = _truncate_to_length(item, self.limit - self.size)
+                item_size = telegram_length(item)
+        
+        self.parts.append(item)
+        self.size += item_size
+        return completed
+
+    def finish(self):
+        if not self.parts:
+            return []
+        message = "".join(self.parts).strip()
+        self.parts = []
+        self.count += 1
+        return [message]
+
+def pack_messages(item_texts, header, limit=TELEGRAM_MESSAGE_LIMIT):
+    """Pack rendered items into as few messages as possible under Telegram's size limit
+
+    header(part_number) returns the heading of each message. Items are kept
+    whole; only an item that cannot fit in a message on its own is truncated.
+    """
+    packer = MessagePacker(header, limit)
+    messages = []
+    for item in item_texts:
+        messages.extend(packer.add(item))
+    messages.extend(packer.finish())
     return messages
 
+def part_header(title):
+    """Header factory for pack_messages: '*Title:*' then '*Title (Part N):*'"""
+    def header(part_number):
+        if part_number == 1:
+            return f"*{title}:*\n\n"
+        return f"*{title} (Part {part_number}):*\n\n"
+    return header
+
+def render_expiring_item(idx, item):
+    """Render one expiring product entry"""
+    days_text = "Today!" if item.days_left == 0 else f"{item.days_left} day(s)"
+    
+    purchased_date = format_date_readable(item.purchased_date)
+    expired_date = format_date_readable(item.expired_date)
+    
+    return (
+        f"{idx}. Product: {list_field(item.display_product)}\n"
+        f"Customer: `{list_field(item.customer)}`\n"
+        f"Email: `{list_field(item.email or '-')}`\n"
+        f"{purchased_date} to {expired_date}\n"
+        f"Ends in: {days_text}\n\n"
+    )
+
+def render_renewal_item(idx, item):
+    """Render one renewal entry"""
+    days_text = "Today!" if item.days_left == 0 else f"{item.days_left} day(s)"
+    
+    purchased_date = format_date_readable(item.purchased_date)
+    expired_date = format_date_readable(item.expired_date)
+    next_due = format_date_readable(item.next_due)
+    
+    return (
+        f"{idx}. Product: {list_field(item.display_product)}\n"
+        f"Customer: `{list_field(item.customer)}`\n"
+        f"Email: `{list_field(item.email or '-')}`\n"
+        f"{purchased_date} to {expired_date}\n"
+        f"Next Due: {next_due}\n"
+        f"Due in: {days_text}\n\n"
+    )
+
+def render_sale_item(idx, sale):
+    """Render one sale line of the daily sales list"""
+    return (
+        f"{idx}. {sale['sale_product']}\n"
+        f"Customer: {sale['customer']}\n"
+        f"Price: {int(sale['price'])} Ks\n\n"
+    )
+
+def format_expiring_message(items, title="Expiring Products"):
+    """Format expiring items into as few messages as fit Telegram's size limit"""
+    if not items:
+        return [f"No {title.lower()} within 2 days."]
+    
+    return pack_messages(
+        [render_expiring_item(idx, item) for idx, item in enumerate(items, 1)],
+        part_header(title)
+    )
+
 def format_renewals_message(renewals):
-    """Format renewals into a message - 15 products per message"""
+    """Format renewals into as few messages as fit Telegram's size limit"""
     if not renewals:
         return ["No renewals due within 2 days."]
     
-    messages = []
-    products_per_message = 15
-    
-    for i in range(0, len(renewals), products_per_message):
-        batch = renewals[i:i + products_per_message]
-        message_number = (i // products_per_message) + 1
-        
-        if message_number == 1:
-            current_message = "*Renewals Due Soon:*\n\n"
-        else:
-            current_message = f"*Renewals Due Soon (Part {message_number}):*\n\n"
-        
-        for idx, item in enumerate(batch, i + 1):
-            days_text = "Today!" if item["days_left"] == 0 else f"{item['days_left']} day(s)"
-            
-            purchased_date = format_date_readable(item['purchased_date'])
-            expired_date = format_date_readable(item['expired_date'])
-            next_due = format_date_readable(item['next_due'])
+    return pack_messages(
+        [render_renewal_item(idx, item) for idx, item in enumerate(renewals, 1)],
+        part_header("Renewals Due Soon")
+    )
+
+def format_sales_details_message(sales, summary=""):
+    """Format today's sales list; every part repeats the order count heading
+
+    summary, if given, is placed above the heading of the first part.
+    """
+    heading = f"*Today's Sales ({len(sales)} orders):*\n\n"
+    return pack_messages(
+        [render_sale_item(idx, sale) for idx, sale in enumerate(sales, 1)],
+        lambda part_number: summary + heading if part_number == 1 else heading
+    )
+
+class TokenBucket:
+    """Token bucket that hands out reservations instead of blocking"""
+
+    def __init__(self, rate, capacity):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = time.monotonic()
+
+    def reserve(self):
+        """Take one token and return how many seconds to wait before using it"""
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        self.tokens -= 1
+        return 0 if self.tokens >= 0 else -self.tokens / self.rate
+
+class OutboundSender:
+    """Central outbound queue for Telegram sends
+
+    Each chat gets a FIFO queue drained by one worker task, so messages to a
+    chat keep their order while different chats send in parallel. Every send
+    takes a token from the chat bucket, the channel bucket (for CHANNEL_ID)
+    and the global bucket, and RetryAfter/timeouts are retried with backoff.
+    """
+
+    def __init__(self):
+        self.global_bucket = TokenBucket(GLOBAL_SEND_RATE, GLOBAL_SEND_BURST)
+        self.chat_buckets = {}
+        self.chat_queues = {}
+        self.workers = {}
+        self.send_times = deque(maxlen=500)
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    def _chat_bucket(self, chat_id):
+        if chat_id not in self.chat_buckets:
+            if chat_id == CHANNEL_ID:
+                self.chat_buckets[chat_id] = TokenBucket(CHANNEL_SEND_RATE, CHANNEL_SEND_BURST)
+            else:
+                self.chat_buckets[chat_id] = TokenBucket(CHAT_SEND_RATE, CHAT_SEND_BURST)
+        return self.chat_buckets[chat_id]
+
+    def submit(self, chat_id, make_request):
+        """Queue make_request (a zero-argument callable returning a coroutine) for chat_id
+
+        Returns a future that resolves to the API result, or None if the send failed.
+        """
+        future = asyncio.get_running_loop().create_future()
+        queue = self.chat_queues.get(chat_id)
+        if queue is None:
+            queue = self.chat_queues[chat_id] = deque()
+            # The loop only keeps weak references to tasks, so hold on to each worker
+            worker = self.workers[chat_id] = asyncio.create_task(self._drain(chat_id, queue))
+            worker.add_done_callback(functools.partial(self._worker_done, chat_id))
+        queue.append((make_request, future))
+        return future
+
+    async def send(self, chat_id, make_request):
+        """Queue one request and wait until it has been delivered"""
+        return await self.submit(chat_id, make_request)
+
+    async def send_all(self, chat_id, make_requests):
+        """Queue several requests for a chat in order and wait for all of them"""
+        return await asyncio.gather(*[self.submit(chat_id, make) for make in make_requests])
+
+    async def send_message(self, bot, chat_id, text, **kwargs):
+        """Queue bot.send_message(chat_id, text, ...) and wait for delivery"""
+        return await self.send(chat_id, lambda: bot.send_message(chat_id=chat_id, text=text, **kwargs))
+
+    def _worker_done(self, chat_id, worker):
+        if self.workers.get(chat_id) is worker:
+            del self.workers[chat_id]
+
+    async def _drain(self, chat_id, queue):
+        # The worker exits once its queue is empty; submit() starts a new one
+        while queue:
+            make_request, future = queue.popleft()
+            result = await self._deliver(chat_id, make_request)
+            if not future.done():
+                future.set_result(result)
+        del self.chat_queues[chat_id]
+
+    async def _deliver(self, chat_id, make_request):
+        for attempt in range(SEND_MAX_RETRIES + 1):
+            wait = max(self._chat_bucket(chat_id).reserve(), self.global_bucket.reserve())
+            if wait:
+                await asyncio.sleep(wait)
             
-            item_text = (
-                f"{idx}. Product: {escape_markdown(item['sale_product'])}\n"
-                f"Customer: `{escape_markdown(item['customer'])}`\n"
-                f"Email: `{escape_markdown(item['email'] or '-')}`\n"
-                f"{purchased_date} to {expired_date}\n"
-                f"Next Due: {next_due}\n"
-                f"Due in: {days_text}\n\n"
-            )
+            started = time.perf_counter()
+            try:
+                result = await make_request()
+                self.send_times.append(time.perf_counter() - started)
+                self.sent += 1
+                return result
+            except BadRequest as e:
+                # A subclass of NetworkError, but retrying cannot fix the request
+                logger.error(f"Send to chat {chat_id} rejected: {e}")
+                break
+            except RetryAfter as e:
+                delay = e.retry_after
+                delay = delay.total_seconds() if isinstance(delay, timedelta) else float(delay)
+                logger.warning(f"Flood control for chat {chat_id}, retrying in {delay}s")
+            except (TimedOut, NetworkError) as e:
+                delay = SEND_BACKOFF_SECONDS * (2 ** attempt)
+                logger.warning(f"Send to chat {chat_id} failed ({e}), retrying in {delay}s")
+            except Exception as e:
+                logger.error(f"Send to chat {chat_id} failed: {e}")
+                break
             
-            current_message += item_text
+            if attempt < SEND_MAX_RETRIES:
+                self.retries += 1
+                await asyncio.sleep(delay)
         
-        messages.append(current_message.strip())
-    
-    return messages
+        self.failed += 1
+        return None
+
+    async def wait_idle(self):
+        """Wait until every queued message has been delivered or given up on"""
+        while self.workers:
+            await asyncio.gather(*list(self.workers.values()))
+
+    def queued(self, chat_id=None):
+        """Number of messages waiting to be sent, for one chat or overall"""
+        if chat_id is not None:
+            return len(self.chat_queues.get(chat_id, ()))
+        return sum(len(queue) for queue in self.chat_queues.values())
+
+    def stats(self):
+        """Queue depth, delivery counters and recent send latency in milliseconds"""
+        times = sorted(self.send_times)
+        return {
+            'queued': self.queued(),
+            'active_chats': len(self.chat_queues),
+            'sent': self.sent,
+            'failed': self.failed,
+            'retries': self.retries,
+            'send_ms_avg': sum(times) / len(times) * 1000 if times else 0,
+            'send_ms_p95': times[int(len(times) * 0.95)] * 1000 if times else 0,
+        }
+
+outbound_sender = OutboundSender()
+
+async def reply_messages(update: Update, messages, parse_mode="Markdown"):
+    """Queue handler output on the outbound queue without waiting for delivery
+
+    For button taps the first message replaces the menu and the rest are sent
+    as new messages; for commands every message is a reply. Pass
+    parse_mode=None for text that echoes user input or error messages.
+
+    The chat's FIFO keeps the messages in order, and the handler returns its
+    update slot instead of sleeping through the chat's send rate. Returns the
+    delivery futures.
+    """
+    chat_id = update.effective_chat.id
+    requests = []
+    for i, message in enumerate(messages):
+        if update.callback_query and i == 0:
+            requests.append(functools.partial(
+                update.callback_query.edit_message_text, message, parse_mode=parse_mode
+            ))
+        else:
+            target = update.callback_query.message if update.callback_query else update.message
+            requests.append(functools.partial(target.reply_text, message, parse_mode=parse_mode))
+    return [outbound_sender.submit(chat_id, make_request) for make_request in requests]
+
+async def drain_queues(app):
+    """Application post_stop hook: commit queued sales, then deliver queued replies"""
+    await drain_sale_writer(app)
+    await outbound_sender.wait_idle()
 
 async def send_batched_messages(context, messages, chat_id):
     """Send messages in batches to avoid Telegram limits"""
@@ -669,33 +2502,55 @@ async def send_batched_messages(context, messages, chat_id):
         except Exception as e:
             logger.error(f"Failed to send batch starting at #{i+1}: {e}")
 
+async def stream_expiring_digest(title="Expiring Products"):
+    """Yield the format_expiring_message output while the expiring rows stream in"""
+    packer = MessagePacker(part_header(title))
+    today = get_bangkok_today()
+    count = 0
+    try:
+        async with contextlib.aclosing(stream_expiring_soon_products()) as chunks:
+            async for rows in chunks:
+                for item in iter_expiring_items(rows, today):
+                    count += 1
+                    for message in packer.add(render_expiring_item(count, item)):
+                        yield message
+    except Exception as e:
+        logger.error(f"Error in stream_expiring_digest: {e}")
+    
+    if not count:
+        yield f"No {title.lower()} within 2 days."
+    for message in packer.finish():
+        yield message
+
 async def auto_send_daily_notifications(context: ContextTypes.DEFAULT_TYPE):
     """Automatically send daily notifications for expiring products and renewals"""
     try:
-        # Get expiring products
-        expiring_data = get_expiring_soon_products()
-        expiring_soon = process_expiring_data(expiring_data)
-
-        # Get renewals due soon
-        renewals = get_renewals_due_soon()
-
-        # Send expiring products notification
-        expiring_messages = format_expiring_message(expiring_soon)
-        for message in expiring_messages:
-            await context.bot.send_message(
-                chat_id=CHANNEL_ID, 
-                text=message, 
-                parse_mode="Markdown"
-            )
-
-        # Send renewals notification
-        renewals_messages = format_renewals_message(renewals)
-        for message in renewals_messages:
-            await context.bot.send_message(
-                chat_id=CHANNEL_ID, 
-                text=message, 
-                parse_mode="Markdown"
-            )
+        # The sender paces digest messages for the channel and a failed
+        # message no longer aborts the rest. Without the snapshot, each one is
+        # queued as soon as it is packed and only one chunk of rows is held
+        # at a time, however large the tables.
+        def queue(message):
+            return outbound_sender.submit(CHANNEL_ID, functools.partial(
+                context.bot.send_message, chat_id=CHANNEL_ID, text=message, parse_mode="Markdown"
+            ))
+        
+        pending = []
+        if DIGEST_SNAPSHOT:
+            # Usually built right here, then reused by /expiring and /renewals
+            snapshot = await get_digest_snapshot()
+            pending.extend(queue(message) for message in snapshot.digest_messages())
+        else:
+            async for message in stream_expiring_digest():
+                pending.append(queue(message))
+            
+            renewals = await stream_renewals_due_soon()
+            pending.extend(queue(message) for message in format_renewals_message(renewals))
+        
+        results = await asyncio.gather(*pending)
+        failed = sum(1 for result in results if result is None)
+        if failed:
+            logger.error(f"Daily notifications: {failed} of {len(pending)} messages failed")
+        logger.info(f"Daily notifications sent: {outbound_sender.stats()}")
         
     except Exception as e:
         logger.error(f"Error in auto_send_daily_notifications: {e}")
@@ -705,7 +2560,7 @@ async def auth_required(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Check if user is authenticated"""
     telegram_id = update.effective_user.id
     
-    if not check_user_auth(telegram_id):
+    if not await check_user_auth(telegram_id):
         # Check if user is in login flow
         if not context.user_data.get('login_flow'):
             await start_login_flow(update, context)
@@ -742,7 +2597,7 @@ async def handle_login(update: Update, context: ContextTypes.DEFAULT_TYPE):
         
         # Validate against your user database
         if validate_credentials(username, password):
-            if save_authenticated_user(telegram_id, username):
+            if await save_authenticated_user(telegram_id, username):
                 # Clear login flow
                 context.user_data.clear()
                 
@@ -791,6 +2646,130 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     await show_main_menu(update, context)
 
+async def show_product_picker(update: Update, context: ContextTypes.DEFAULT_TYPE, product_type, page):
+    """Show one page of the product picker for retail or wholesale products"""
+    products = await fetch_products_by_type(product_type)
+    page_count = max(1, -(-len(products) // PRODUCT_PAGE_SIZE))
+    page = min(max(page, 0), page_count - 1)
+    start_idx = page * PRODUCT_PAGE_SIZE
+    
+    keyboard = []
+    row = []
+    for i, product in enumerate(products[start_idx:start_idx + PRODUCT_PAGE_SIZE], 1):
+        row.append(InlineKeyboardButton(
+            product['product_name'], 
+            callback_data=f"product_{product['product_id']}"
+        ))
+        if i % 2 == 0:
+            keyboard.append(row)
+            row = []
+    
+    if row:
+        keyboard.append(row)
+    
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("◀ Prev", callback_data=f"pp:{product_type}:{page - 1}"))
+    if page < page_count - 1:
+        nav.append(InlineKeyboardButton("Next ▶", callback_data=f"pp:{product_type}:{page + 1}"))
+    if nav:
+        keyboard.append(nav)
+    
+    text = f"Select a {product_type} product:"
+    if page_count > 1:
+        text = (
+            f"Select a {product_type} product (page {page + 1} of {page_count}):\n"
+            f"Tip: type @{context.bot.username} and a few letters to search."
+        )
+    await update.callback_query.edit_message_text(text, reply_markup=InlineKeyboardMarkup(keyboard))
+
+async def start_sale_flow(update: Update, context: ContextTypes.DEFAULT_TYPE, product_id):
+    """Load a product and ask for the sale details"""
+    product = await fetch_product_details(product_id)
+    if update.callback_query:
+        respond = update.callback_query.edit_message_text
+    else:
+        respond = update.message.reply_text
+    
+    if not product:
+        await respond("Product not found.")
+        return
+    
+    context.user_data.update({
+        "flow": "add_sale", 
+        "product": product, 
+        "awaiting": True
+    })
+    
+    # Check if it's a wholesale product to show different input format
+    if product.get('product_type') == 'wholesale':
+        input_format = (
+            "Please enter the following (one per line):\n"
+            "Customer Name\n"
+            "Email\n"
+            "Manager\n"
+            "Quantity\n"
+            "[Optional] Custom Price per unit"
+        )
+    else:
+        input_format = (
+            "Please enter the following (one per line):\n"
+            "Customer Name\n"
+            "Email\n"
+            "Manager\n"
+            "[Optional] Custom Price"
+        )
+    
+    await respond(
+        f"*Product:* {product['product_name']}\n"
+        f"*Type:* {product.get('product_type', 'retail').title()}\n"
+        f"*Duration:* {product['duration']} months\n"
+        f"*Wholesale:* {product['wholesale']} Ks\n"
+        f"*Retail:* {product['retail']} Ks\n\n"
+        f"{input_format}",
+        parse_mode="Markdown"
+    )
+
+async def sell_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Start a sale for a product ID, e.g. /sell R-12 sent from an inline search result"""
+    if not await auth_required(update, context):
+        return
+    
+    if not context.args:
+        await update.message.reply_text("Usage: `/sell R-12` or `/sell WS-3`", parse_mode="Markdown")
+        return
+    
+    try:
+        await start_sale_flow(update, context, context.args[0])
+    except Exception as e:
+        logger.error(f"Error in sell_handler: {e}")
+        await update.message.reply_text("An error occurred. Please try again.")
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Search products by name from inline mode (@bot netfl)"""
+    inline_query = update.inline_query
+    if not await check_user_auth(inline_query.from_user.id):
+        await inline_query.answer([], cache_time=0, is_personal=True)
+        return
+    
+    try:
+        index = await get_product_search_index()
+        products = index.search(inline_query.query)
+    except Exception as e:
+        logger.error(f"Error in inline_query_handler: {e}")
+        products = []
+    
+    results = [
+        InlineQueryResultArticle(
+            id=product['product_id'],
+            title=f"{product['product_type'].title()} - {product['product_name']}",
+            description=f"{product['duration']} months - {product['retail']} Ks",
+            input_message_content=InputTextMessageContent(f"/sell {product['product_id']}")
+        )
+        for product in products
+    ]
+    await inline_query.answer(results, cache_time=INLINE_CACHE_SECONDS, is_personal=True)
+
 async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle button callbacks"""
     query = update.callback_query
@@ -802,72 +2781,39 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     try:
         if query.data == 'add_retail_sale':
-            products = fetch_retail_products()
-            keyboard = []
-            row = []
-            
-            for i, product in enumerate(products, 1):
-                row.append(InlineKeyboardButton(
-                    product['product_name'], 
-                    callback_data=f"product_{product['product_id']}"
-                ))
-                if i % 2 == 0:
-                    keyboard.append(row)
-                    row = []
-            
-            if row:
-                keyboard.append(row)
-            
-            await query.edit_message_text(
-                "Select a retail product:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+            await show_product_picker(update, context, 'retail', 0)
 
         elif query.data == 'add_wholesale_sale':
-            products = fetch_wholesale_products()
-            keyboard = []
-            row = []
-            
-            for i, product in enumerate(products, 1):
-                row.append(InlineKeyboardButton(
-                    product['product_name'], 
-                    callback_data=f"product_{product['product_id']}"
-                ))
-                if i % 2 == 0:
-                    keyboard.append(row)
-                    row = []
-            
-            if row:
-                keyboard.append(row)
-            
-            await query.edit_message_text(
-                "Select a wholesale product:",
-                reply_markup=InlineKeyboardMarkup(keyboard)
-            )
+            await show_product_picker(update, context, 'wholesale', 0)
+
+        elif query.data.startswith('pp:'):
+            # Prev/Next on the product picker
+            _, product_type, page = query.data.split(':')
+            await show_product_picker(update, context, product_type, int(page))
 
         elif query.data == 'summary':
             # Show today's summary with sales details
             today = get_bangkok_now().strftime('%Y-%m-%d')
-            total_sales, total_profit = get_summary_data(today)
-            today_sales_details = get_today_sales_details()
+            (total_sales, total_profit), _, today_sales_details = await fetch_summary_bundle(
+                today, include_monthly=False
+            )
             
             if total_sales is not None:
-                response = f"*Summary for {today}:*\n\n"
-                response += f"Total Sales: {int(total_sales)} Ks\n"
-                response += f"Total Profit: {int(total_profit)} Ks\n\n"
+                summary = "".join([
+                    f"*Summary for {today}:*\n\n",
+                    f"Total Sales: {int(total_sales)} Ks\n",
+                    f"Total Profit: {int(total_profit)} Ks\n\n",
+                ])
                 
+                # The first part replaces the menu, any further parts follow as new messages
                 if today_sales_details:
-                    response += f"*Today's Sales ({len(today_sales_details)} orders):*\n\n"
-                    for idx, sale in enumerate(today_sales_details, 1):
-                        response += f"{idx}. {sale['sale_product']}\n"
-                        response += f"Customer: {sale['customer']}\n"
-                        response += f"Price: {int(sale['price'])} Ks\n\n"
+                    messages = format_sales_details_message(today_sales_details, summary)
                 else:
-                    response += "*Today's Sales:* No sales today"
+                    messages = [summary + "*Today's Sales:* No sales today"]
             else:
-                response = "Failed to fetch summary data."
+                messages = ["Failed to fetch summary data."]
             
-            await query.edit_message_text(response, parse_mode="Markdown")
+            await reply_messages(update, messages)
 
         elif query.data == 'expiring':
             # Show expiring products
@@ -877,53 +2823,119 @@ async def button_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
             # Show renewals due soon
             await renewals_handler(update, context)
 
+        elif query.data.startswith(('exp:', 'ren:')):
+            # Prev/Next on a paginated list view
+            view, direction, page, key_token = query.data.split(':', 3)
+            await show_list_page(update, view, direction, int(page), key_token)
+
         elif query.data.startswith("product_"):
             # Product selected, get details and start input flow
-            product_id = query.data.replace("product_", "")
-            product = fetch_product_details(product_id)
-            
-            if product:
-                context.user_data.update({
-                    "flow": "add_sale", 
-                    "product": product, 
-                    "awaiting": True
-                })
-                
-                # Check if it's a wholesale product to show different input format
-                if product.get('product_type') == 'wholesale':
-                    input_format = (
-                        "Please enter the following (one per line):\n"
-                        "Customer Name\n"
-                        "Email\n"
-                        "Manager\n"
-                        "Quantity\n"
-                        "[Optional] Custom Price per unit"
-                    )
-                else:
-                    input_format = (
-                        "Please enter the following (one per line):\n"
-                        "Customer Name\n"
-                        "Email\n"
-                        "Manager\n"
-                        "[Optional] Custom Price"
-                    )
-                
-                await query.edit_message_text(
-                    f"*Product:* {product['product_name']}\n"
-                    f"*Type:* {product.get('product_type', 'retail').title()}\n"
-                    f"*Duration:* {product['duration']} months\n"
-                    f"*Wholesale:* {product['wholesale']} Ks\n"
-                    f"*Retail:* {product['retail']} Ks\n\n"
-                    f"{input_format}",
-                    parse_mode="Markdown"
-                )
-            else:
-                await query.edit_message_text("Product not found.")
+            await start_sale_flow(update, context, query.data.replace("product_", ""))
                 
     except Exception as e:
         logger.error(f"Error in button_handler: {e}")
         await query.edit_message_text("An error occurred. Please try again.")
 
+class SaleInputError(ValueError):
+    """Invalid sale entry; str() is the reason, reply is the prompt for single-sale entry"""
+
+    def __init__(self, reason, reply):
+        super().__init__(reason)
+        self.reply = reply
+
+def parse_custom_price(lines, index, product, strict):
+    """Optional price line at index, else the catalog retail price
+
+    The single-sale flow falls back to the catalog price on unparsable input;
+    strict (bulk entry) rejects it like api/sales_bulk_insert.php.
+    """
+    if len(lines) <= index or not lines[index]:
+        return float(product['retail'])
+    if lines[index].replace('.', '', 1).isdigit():
+        return float(lines[index])
+    if strict:
+        raise SaleInputError(
+            f"Invalid price format. Received: '{lines[index]}'",
+            "❌ Invalid price format. Please enter a number. Please try again:"
+        )
+    return float(product['retail'])
+
+def build_sale_data(product, lines, purchased_date, strict=False):
+    """Turn the input lines of one sale entry into save_sale data for a product
+
+    strict=True reports an unparsable custom price instead of using the catalog price.
+    """
+    product_type = product.get('product_type', 'retail')
+
+    # Different handling for wholesale vs retail
+    if product_type == 'wholesale':
+        # Wholesale format: Customer, Email, Manager, Quantity, [Optional] Custom Price per unit
+        if len(lines) < 4:
+            raise SaleInputError(
+                "Expected at least: Customer, Email, Manager, Quantity",
+                "Invalid input format for wholesale. Please provide at least: Customer, Email, Manager, Quantity\n\nPlease try again with the correct format:"
+            )
+        customer, email, manager = lines[0], lines[1], lines[2]
+        
+        # Parse quantity
+        try:
+            quantity = int(lines[3])
+        except ValueError:
+            raise SaleInputError(
+                "Invalid quantity format",
+                "❌ Invalid quantity format. Please enter a number. Please try again:"
+            )
+        if quantity <= 0:
+            raise SaleInputError(
+                "Quantity must be a positive number",
+                "❌ Quantity must be a positive number. Please try again:"
+            )
+        
+        # Parse optional price per unit
+        price_per_unit = parse_custom_price(lines, 4, product, strict)
+        
+        # Calculate total price and profit
+        total_price = price_per_unit * quantity
+        profit_per_unit = price_per_unit - float(product['wholesale'])
+        total_profit = profit_per_unit * quantity
+        
+        # Create note with quantity info
+        note = f"Quantity: {quantity} units @ {price_per_unit} Ks each"
+    else:
+        # Retail format: Customer, Email, Manager, [Optional] Custom Price
+        if len(lines) < 3:
+            raise SaleInputError(
+                "Expected at least: Customer, Email, Manager",
+                "Invalid input format for retail. Please provide at least: Customer, Email, Manager\n\nPlease try again with the correct format:"
+            )
+        customer, email, manager = lines[0], lines[1], lines[2]
+        
+        # Parse optional price
+        total_price = parse_custom_price(lines, 3, product, strict)
+        
+        # Calculate profit
+        total_profit = total_price - float(product['wholesale'])
+        
+        # No quantity for retail
+        note = ''
+        quantity = 1  # Default quantity for retail
+    
+    return {
+        'sale_product': product['product_name'],
+        'duration': product['duration'],
+        'renew': product['renew'],  # Get renew from product catalog
+        'customer': customer,
+        'email': email,
+        'purchased_date': purchased_date,
+        'expired_date': None,  # Will be calculated in save_sale
+        'manager': manager,
+        'note': note,
+        'price': total_price,
+        'profit': total_profit,
+        'product_type': product_type,
+        'quantity': quantity
+    }
+
 async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle text input for sale creation"""
     # Check if user is in login flow
@@ -939,83 +2951,24 @@ async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not await auth_required(update, context):
         return
 
+    if context.user_data.get("flow") == "bulk_sale":
+        await handle_bulk_text(update, context)
+        return
+
     try:
         lines = [l.strip() for l in update.message.text.splitlines() if l.strip()]
         product = context.user_data['product']
         product_type = product.get('product_type', 'retail')
 
-        # Different handling for wholesale vs retail
-        if product_type == 'wholesale':
-            # Wholesale format: Customer, Email, Manager, Quantity, [Optional] Custom Price per unit
-            if len(lines) >= 4:
-                customer, email, manager = lines[0], lines[1], lines[2]
-                
-                # Parse quantity
-                try:
-                    quantity = int(lines[3])
-                    if quantity <= 0:
-                        await update.message.reply_text("❌ Quantity must be a positive number. Please try again:")
-                        return
-                except ValueError:
-                    await update.message.reply_text("❌ Invalid quantity format. Please enter a number. Please try again:")
-                    return
-                
-                # Parse optional price per unit
-                price_per_unit = float(lines[4]) if len(lines) >= 5 and lines[4].replace('.', '').isdigit() else float(product['retail'])
-                
-                # Calculate total price and profit
-                total_price = price_per_unit * quantity
-                profit_per_unit = price_per_unit - float(product['wholesale'])
-                total_profit = profit_per_unit * quantity
-                
-                # Create note with quantity info
-                note = f"Quantity: {quantity} units @ {price_per_unit} Ks each"
-                
-                # Store quantity in data for database insertion
-                quantity_for_db = quantity
-                
-            else:
-                await update.message.reply_text("Invalid input format for wholesale. Please provide at least: Customer, Email, Manager, Quantity\n\nPlease try again with the correct format:")
-                return
-        else:
-            # Retail format: Customer, Email, Manager, [Optional] Custom Price
-            if len(lines) >= 3:
-                customer, email, manager = lines[0], lines[1], lines[2]
-                
-                # Parse optional price
-                total_price = float(lines[3]) if len(lines) >= 4 and lines[3].replace('.', '').isdigit() else float(product['retail'])
-                
-                # Calculate profit
-                total_profit = total_price - float(product['wholesale'])
-                
-                # No quantity for retail
-                note = ''
-                quantity_for_db = 1  # Default quantity for retail
-            else:
-                await update.message.reply_text("Invalid input format for retail. Please provide at least: Customer, Email, Manager\n\nPlease try again with the correct format:")
-                return
-        
-        today = get_bangkok_now()
-        
-        data = {
-            'sale_product': product['product_name'],
-            'duration': product['duration'],
-            'renew': product['renew'],  # Get renew from product catalog
-            'customer': customer,
-            'email': email,
-            'purchased_date': today.strftime('%Y-%m-%d'),
-            'expired_date': None,  # Will be calculated in save_sale
-            'manager': manager,
-            'note': note,
-            'price': total_price,
-            'profit': total_profit,
-            'product_type': product_type,
-            'quantity': quantity_for_db
-        }
+        try:
+            data = build_sale_data(product, lines, get_bangkok_now().strftime('%Y-%m-%d'))
+        except SaleInputError as e:
+            await update.message.reply_text(e.reply)
+            return
         
-        if save_sale(data):
+        if await save_sale(data):
             if product_type == 'wholesale':
-                await update.message.reply_text(f"✅ Wholesale sale saved successfully!\nQuantity: {quantity} units\nTotal: {total_price} Ks")
+                await update.message.reply_text(f"✅ Wholesale sale saved successfully!\nQuantity: {data['quantity']} units\nTotal: {data['price']} Ks")
             else:
                 await update.message.reply_text("✅ Sale saved successfully!")
         else:
@@ -1028,36 +2981,224 @@ async def text_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         logger.error(f"Error in text_handler: {e}")
         await update.message.reply_text("❌ An error occurred. Please try again.")
 
-async def expiring_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    """Handle expiring products command"""
-    # Check authentication first
+BULK_INSTRUCTIONS = (
+    "*Bulk sale entry*\n\n"
+    "Send several sales in one message, separated by a blank line. "
+    "Each block starts with the product ID, then the usual lines:\n\n"
+    "`R-12`\nCustomer\nEmail\nManager\n[Optional] Custom Price\n\n"
+    "`WS-3`\nCustomer\nEmail\nManager\nQuantity\n[Optional] Custom Price per unit\n\n"
+    "Or upload a CSV file with the columns "
+    "`product_id, customer, email, manager, quantity, price, purchased_date` "
+    "(quantity defaults to 1; price and `purchased_date` are optional).\n\n"
+    "Nothing is saved unless every row is valid."
+)
+
+async def bulk_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Enter bulk sale mode"""
     if not await auth_required(update, context):
         return
+    
+    context.user_data.update({"flow": "bulk_sale", "awaiting": True})
+    await update.message.reply_text(BULK_INSTRUCTIONS, parse_mode="Markdown")
+
+async def validate_bulk_entries(entries):
+    """Validate (row number, product id, lines, purchased date) entries
+
+    Returns (sales, errors) with PHP-style "Row N: ..." error strings.
+    """
+    sales = []
+    errors = []
+    
+    if len(entries) > BULK_MAX_ROWS:
+        return [], [f"Too many rows: {len(entries)} (maximum {BULK_MAX_ROWS})"]
+    
+    for row_number, product_id, lines, purchased_date in entries:
+        if not product_id:
+            errors.append(f"Row {row_number}: Product ID is required")
+            continue
+        if lines and not lines[0]:
+            errors.append(f"Row {row_number}: Customer name is required")
+            continue
+        if not re.fullmatch(r'\d{4}-\d{2}-\d{2}', purchased_date):
+            errors.append(f"Row {row_number}: Invalid purchase date format (YYYY-MM-DD). Received: '{purchased_date}'")
+            continue
+        try:
+            parse_date_safe(purchased_date)
+        except ValueError:
+            errors.append(f"Row {row_number}: Invalid purchase date '{purchased_date}'")
+            continue
+        
+        try:
+            product = await fetch_product_details(product_id)
+        except Exception as e:
+            errors.append(f"Row {row_number}: Database error - {e}")
+            continue
+        if not product:
+            errors.append(f"Row {row_number}: Product '{product_id}' not found")
+            continue
         
+        try:
+            sales.append(build_sale_data(product, lines, purchased_date, strict=True))
+        except SaleInputError as e:
+            errors.append(f"Row {row_number}: {e}")
+    
+    return sales, errors
+
+def parse_bulk_text(text, purchased_date):
+    """Split a bulk message into entries: blocks separated by blank lines, product ID first"""
+    entries = []
+    blocks = re.split(r'\n\s*\n', text.strip())
+    for row_number, block in enumerate(blocks, 1):
+        lines = [l.strip() for l in block.splitlines() if l.strip()]
+        if lines:
+            entries.append((row_number, lines[0].upper(), lines[1:], purchased_date))
+    return entries
+
+def parse_bulk_csv(content, purchased_date):
+    """Turn CSV rows into the same entries as parse_bulk_text"""
+    entries = []
+    reader = csv.DictReader(io.StringIO(content))
+    for row_number, row in enumerate(reader, 1):
+        row = {(key or '').strip().lower(): (value or '').strip() for key, value in row.items()}
+        product_id = row.get('product_id', '').upper()
+        lines = [row.get('customer', ''), row.get('email', ''), row.get('manager', '')]
+        if product_id.startswith('WS-'):
+            lines.append(row.get('quantity') or '1')
+        if row.get('price'):
+            lines.append(row['price'])
+        entries.append((row_number, product_id, lines, row.get('purchased_date') or purchased_date))
+    return entries
+
+async def save_bulk_entries(update: Update, context: ContextTypes.DEFAULT_TYPE, entries):
+    """Validate a whole batch, then write it and report like api/sales_bulk_insert.php"""
+    if not entries:
+        await update.message.reply_text("No sales found. Send /bulk to see the format.")
+        return
+    
+    sales, errors = await validate_bulk_entries(entries)
+    if errors:
+        await reply_messages(update, pack_messages(
+            [f"{error}\n" for error in errors],
+            lambda part_number: f"❌ Validation errors occurred ({len(errors)}). Nothing was saved:\n\n"
+        ), parse_mode=None)
+        return
+    
+    results = await save_sales_bulk(sales)
+    lines = []
+    for sale_type, count in results.items():
+        if count is None:
+            lines.append(f"❌ {sale_type.title()} sales failed to save; none were inserted.")
+        else:
+            lines.append(f"✅ {sale_type.title()}: {count} sales saved.")
+    await update.message.reply_text("\n".join(lines))
+    
+    if all(count is not None for count in results.values()):
+        context.user_data.clear()
+
+async def handle_bulk_text(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Bulk sale entry from a text message"""
     try:
-        data = get_expiring_soon_products()
-        soon = process_expiring_data(data)
+        entries = parse_bulk_text(update.message.text, get_bangkok_now().strftime('%Y-%m-%d'))
+        await save_bulk_entries(update, context, entries)
+    except Exception as e:
+        logger.error(f"Error in handle_bulk_text: {e}")
+        await update.message.reply_text("❌ An error occurred. Please try again.")
 
-        if not soon:
-            response = "No products expiring within 2 days."
-            if update.callback_query:
-                await update.callback_query.edit_message_text(response)
-            else:
-                await update.message.reply_text(response)
+async def document_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Bulk sale entry from an uploaded CSV file"""
+    if not await auth_required(update, context):
+        return
+    
+    if context.user_data.get("flow") != "bulk_sale":
+        await update.message.reply_text("Send /bulk first to upload sales from a CSV file.")
+        return
+    
+    try:
+        document = update.message.document
+        if document.file_size and document.file_size > BULK_MAX_FILE_BYTES:
+            await update.message.reply_text("❌ File is too large.")
             return
+        
+        telegram_file = await document.get_file()
+        content = bytes(await telegram_file.download_as_bytearray()).decode('utf-8-sig')
+        entries = parse_bulk_csv(content, get_bangkok_now().strftime('%Y-%m-%d'))
+        await save_bulk_entries(update, context, entries)
+    except UnicodeDecodeError:
+        await update.message.reply_text("❌ The file must be UTF-8 encoded CSV.")
+    except Exception as e:
+        logger.error(f"Error in document_handler: {e}")
+        await update.message.reply_text("❌ An error occurred. Please try again.")
+
+def encode_sale_key(key):
+    """Compact callback_data form of a keyset cursor: YYYYMMDD.rank.sale_id"""
+    expired_date, rank, sale_id = key
+    return f"{expired_date.replace('-', '')}.{rank}.{sale_id}"
+
+def decode_sale_key(token):
+    """Inverse of encode_sale_key"""
+    expired_date, rank, sale_id = token.split('.')
+    return (datetime.strptime(expired_date, '%Y%m%d').strftime('%Y-%m-%d'), int(rank), int(sale_id))
+
+# view code -> (page loader, item renderer, title, empty message)
+LIST_VIEWS = {
+    'exp': (get_expiring_page, render_expiring_item, "Expiring Products", "No products expiring within 2 days."),
+    'ren': (get_renewals_page, render_renewal_item, "Renewals Due Soon", "No subscriptions due for renewal within 2 days."),
+}
 
-        messages = format_expiring_message(soon)
+async def show_list_page(update: Update, view, direction='n', page=1, key_token=''):
+    """Render one keyset page of a list view with Prev/Next buttons
+
+    Callback data is view:direction:page:cursor, where direction 'n' reads
+    after the cursor and 'p' reads before it.
+    """
+    load_page, render_item, title, empty_message = LIST_VIEWS[view]
+    backward = direction == 'p'
+    cursor = decode_sale_key(key_token) if key_token else None
+    items, first_key, last_key, has_more = await load_page(cursor, backward)
+    
+    buttons = []
+    if items:
+        first_idx = (page - 1) * LIST_PAGE_SIZE + 1
+        text = "".join(
+            [f"*{title} (Page {page}):*\n\n"]
+            + [render_item(idx, item) for idx, item in enumerate(items, first_idx)]
+        ).strip()
+        if telegram_length(text) > TELEGRAM_MESSAGE_LIMIT:
+            text = _truncate_to_length(text, TELEGRAM_MESSAGE_LIMIT)
         
-        if update.callback_query:
-            # For callback queries, we can only edit the first message
-            await update.callback_query.edit_message_text(messages[0], parse_mode="Markdown")
-            # Send additional messages as new messages
-            for message in messages[1:]:
-                await update.callback_query.message.reply_text(message, parse_mode="Markdown")
-        else:
-            # For regular commands, send all messages
-            for message in messages:
-                await update.message.reply_text(message, parse_mode="Markdown")
+        if page > 1 and (has_more or not backward):
+            buttons.append(InlineKeyboardButton(
+                "◀ Prev", callback_data=f"{view}:p:{page - 1}:{encode_sale_key(first_key)}"
+            ))
+        if has_more or backward:
+            buttons.append(InlineKeyboardButton(
+                "Next ▶", callback_data=f"{view}:n:{page + 1}:{encode_sale_key(last_key)}"
+            ))
+    elif page == 1:
+        text = empty_message
+    else:
+        text = f"*{title}:* no more entries."
+    
+    reply_markup = InlineKeyboardMarkup([buttons]) if buttons else None
+    if update.callback_query:
+        send = functools.partial(
+            update.callback_query.edit_message_text, text, parse_mode="Markdown", reply_markup=reply_markup
+        )
+    else:
+        send = functools.partial(
+            update.message.reply_text, text, parse_mode="Markdown", reply_markup=reply_markup
+        )
+    # Queued, not awaited: delivery waits on the chat's send rate, not on the update slot
+    outbound_sender.submit(update.effective_chat.id, send)
+
+async def expiring_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle expiring products command"""
+    # Check authentication first
+    if not await auth_required(update, context):
+        return
+        
+    try:
+        await show_list_page(update, 'exp')
             
     except Exception as e:
         logger.error(f"Error in expiring_handler: {e}")
@@ -1074,28 +3215,7 @@ async def renewals_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
         
     try:
-        renewals = get_renewals_due_soon()
-
-        if not renewals:
-            response = "No subscriptions due for renewal within 2 days."
-            if update.callback_query:
-                await update.callback_query.edit_message_text(response)
-            else:
-                await update.message.reply_text(response)
-            return
-
-        messages = format_renewals_message(renewals)
-        
-        if update.callback_query:
-            # For callback queries, we can only edit the first message
-            await update.callback_query.edit_message_text(messages[0], parse_mode="Markdown")
-            # Send additional messages as new messages
-            for message in messages[1:]:
-                await update.callback_query.message.reply_text(message, parse_mode="Markdown")
-        else:
-            # For regular commands, send all messages
-            for message in messages:
-                await update.message.reply_text(message, parse_mode="Markdown")
+        await show_list_page(update, 'ren')
             
     except Exception as e:
         logger.error(f"Error in renewals_handler: {e}")
@@ -1123,49 +3243,35 @@ async def summary_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         return
 
     try:
-        # Get daily summary
-        daily_sales, daily_profit = get_summary_data(date_str)
-        
-        # Get monthly summary
-        monthly_sales, monthly_profit, monthly_count = get_monthly_summary()
-        
-        # Get today's detailed sales
-        today_sales_details = get_today_sales_details()
+        # Daily summary, monthly summary and today's detailed sales in parallel
+        (daily_sales, daily_profit), (monthly_sales, monthly_profit, monthly_count), today_sales_details = (
+            await fetch_summary_bundle(date_str)
+        )
 
         if daily_sales is None:
             await update.message.reply_text("Failed to fetch summary.")
             return
 
         # Build response
-        response = f"*Sales Summary for {date_str}*\n\n"
-        
-        # Daily summary
-        response += f"*Daily Summary:*\n"
-        response += f"Sales: {int(daily_sales)} Ks\n"
-        response += f"Profit: {int(daily_profit)} Ks\n\n"
-        
-        # Monthly summary
         current_month = get_bangkok_now().strftime('%B %Y')
-        response += f"*Monthly Summary ({current_month}):*\n"
-        response += f"Total Sales: {int(monthly_sales)} Ks\n"
-        response += f"Total Profit: {int(monthly_profit)} Ks\n"
-        response += f"Total Orders: {monthly_count}\n\n"
+        response = "".join([
+            f"*Sales Summary for {date_str}*\n\n",
+            # Daily summary
+            f"*Daily Summary:*\n",
+            f"Sales: {int(daily_sales)} Ks\n",
+            f"Profit: {int(daily_profit)} Ks\n\n",
+            # Monthly summary
+            f"*Monthly Summary ({current_month}):*\n",
+            f"Total Sales: {int(monthly_sales)} Ks\n",
+            f"Total Profit: {int(monthly_profit)} Ks\n",
+            f"Total Orders: {monthly_count}\n\n",
+        ])
 
         await update.message.reply_text(response, parse_mode="Markdown")
         
-        # Send today's sales details in batches of 10
+        # Send today's sales details packed into as few messages as possible
         if today_sales_details:
-            batch_size = 10
-            for i in range(0, len(today_sales_details), batch_size):
-                batch = today_sales_details[i:i + batch_size]
-                batch_response = f"*Today's Sales ({len(today_sales_details)} orders):*\n\n"
-                
-                for j, sale in enumerate(batch, i + 1):
-                    batch_response += f"{j}. {sale['sale_product']}\n"
-                    batch_response += f"Customer: {sale['customer']}\n"
-                    batch_response += f"Price: {int(sale['price'])} Ks\n\n"
-                
-                await update.message.reply_text(batch_response, parse_mode="Markdown")
+            await reply_messages(update, format_sales_details_message(today_sales_details))
         else:
             await update.message.reply_text("*Today's Sales:* No sales today", parse_mode="Markdown")
             
@@ -1175,30 +3281,243 @@ async def summary_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 
+class PerUserUpdateProcessor(BaseUpdateProcessor):
+    """Run different users' updates in parallel, each user's strictly in arrival order
+
+    The login and sale-entry state machines in context.user_data assume one
+    update at a time per user, so every update waits for the previous update
+    from the same user to finish before taking one of UPDATE_CONCURRENCY
+    handler slots. Updates waiting for their turn do not hold a slot, so a
+    user with a slow /expiring queue never blocks anyone else. Replies are
+    queued on the outbound sender rather than awaited, so a chat's send rate
+    does not hold a slot either. PTB's own limit (UPDATE_BACKLOG_LIMIT) only
+    bounds how many updates are in flight.
+    """
+
+    def __init__(self, concurrency=UPDATE_CONCURRENCY, backlog_limit=UPDATE_BACKLOG_LIMIT):
+        super().__init__(max_concurrent_updates=max(backlog_limit, 2))
+        self.concurrency = concurrency
+        self.slots = asyncio.Semaphore(concurrency)
+        self.tails = {}
+        self.depths = {}
+        self.running = 0
+        self.processed = 0
+        self.max_depth = 0
+
+    @staticmethod
+    def ordering_key(update):
+        """The user an update belongs to, falling back to its chat; None means unordered"""
+        if isinstance(update, Update):
+            if update.effective_user:
+                return update.effective_user.id
+            if update.effective_chat:
+                return update.effective_chat.id
+        return None
+
+    async def do_process_update(self, update, coroutine):
+        key = self.ordering_key(update)
+        if key is None:
+            async with self.slots:
+                await coroutine
+            return
+        
+        # Claim a place in the user's chain before the first await, so
+        # updates keep the order in which PTB started their tasks
+        previous = self.tails.get(key)
+        done = asyncio.get_running_loop().create_future()
+        self.tails[key] = done
+        self.depths[key] = self.depths.get(key, 0) + 1
+        self.max_depth = max(self.max_depth, self.depths[key])
+        try:
+            if previous is not None:
+                await previous
+            async with self.slots:
+                self.running += 1
+                try:
+                    await coroutine
+                finally:
+                    self.running -= 1
+                    self.processed += 1
+        finally:
+            done.set_result(None)
+            if self.tails.get(key) is done:
+                del self.tails[key]
+            self.depths[key] -= 1
+            if not self.depths[key]:
+                del self.depths[key]
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def queue_depths(self, top=10):
+        """The users with the most updates running or waiting, as (user, depth) pairs"""
+        return sorted(self.depths.items(), key=lambda item: item[1], reverse=True)[:top]
+
+    def stats(self):
+        """Handler slot usage, queued updates and per-user depth"""
+        return {
+            'running': self.running,
+            'waiting': sum(self.depths.values()) - self.running,
+            'concurrency': self.concurrency,
+            'active_users': len(self.depths),
+            'processed': self.processed,
+            'max_user_depth': self.max_depth,
+            'user_depths': self.queue_depths(),
+        }
+
+update_processor = PerUserUpdateProcessor()
+
+def component_stats():
+    """stats() of the pool, queues and schedulers, keyed by metric prefix"""
+    return {
+        'db_pool': db_pool.stats(),
+        'digest_snapshot': digest_snapshot.stats() if digest_snapshot else {},
+        'outbound': outbound_sender.stats(),
+        'sale_writer': sale_writer.stats(),
+        'updates': update_processor.stats(),
+    }
+
+def timed_handler(callback):
+    """Wrap a handler callback so its latency lands in the handler metrics"""
+    @functools.wraps(callback)
+    async def wrapper(update, context):
+        started = time.perf_counter()
+        error = False
+        try:
+            return await callback(update, context)
+        except Exception:
+            error = True
+            raise
+        finally:
+            metrics.observe_handler(callback.__name__, time.perf_counter() - started, error)
+    return wrapper
+
+def instrument_handlers(app):
+    """Time every handler registered on the application"""
+    for handlers in app.handlers.values():
+        for handler in handlers:
+            handler.callback = timed_handler(handler.callback)
+
+async def handle_metrics_request(reader, writer):
+    """Serve GET /metrics in Prometheus text format; anything else is a 404"""
+    try:
+        request_line = await asyncio.wait_for(reader.readline(), 5)
+        while (await asyncio.wait_for(reader.readline(), 5)) not in (b'\r\n', b'\n', b''):
+            pass
+        
+        parts = request_line.decode('latin-1').split()
+        if len(parts) >= 2 and parts[0] == 'GET' and parts[1].split('?')[0] == '/metrics':
+            status, body = "200 OK", metrics.render_prometheus(component_stats()).encode()
+        else:
+            status, body = "404 Not Found", b"Not found\n"
+        writer.write(
+            f"HTTP/1.1 {status}\r\n"
+            f"Content-Type: text/plain; version=0.0.4; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: close\r\n\r\n".encode() + body
+        )
+        await writer.drain()
+    except (asyncio.TimeoutError, ConnectionError):
+        pass
+    except Exception as e:
+        logger.error(f"Error serving metrics: {e}")
+    finally:
+        writer.close()
+
+async def start_metrics_server(app):
+    """Application post_init hook: serve /metrics unless METRICS_PORT is 0"""
+    if not METRICS_PORT:
+        return
+    try:
+        app.bot_data['metrics_server'] = await asyncio.start_server(handle_metrics_request, METRICS_LISTEN, METRICS_PORT)
+        logger.info(f"Metrics on http://{METRICS_LISTEN}:{METRICS_PORT}/metrics")
+    except OSError as e:
+        logger.error(f"Failed to start metrics server: {e}")
+
+def render_latency_rows(entries):
+    """Fixed-width 'name count p50 p95 p99' lines, slowest p95 first"""
+    rows = sorted(entries.items(), key=lambda item: item[1]['latency'].percentile(0.95), reverse=True)
+    lines = []
+    for name, entry in rows:
+        latency = entry['latency']
+        lines.append(
+            f"{name[:20]:<20} {latency.count:>6} "
+            f"{latency.percentile(0.5) * 1000:>7.1f} {latency.percentile(0.95) * 1000:>7.1f} "
+            f"{latency.percentile(0.99) * 1000:>7.1f}\n"
+        )
+    return lines
+
+async def stats_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show query and handler latency percentiles plus pool and queue state"""
+    if not await auth_required(update, context):
+        return
+    if not ADMIN_TELEGRAM_IDS:
+        await update.message.reply_text("❌ /stats is disabled. Set ERAVERSE_ADMIN_IDS to enable it.")
+        return
+    if update.effective_user.id not in ADMIN_TELEGRAM_IDS:
+        await update.message.reply_text("❌ /stats is limited to admins.")
+        return
+    
+    heading = f"{'name':<20} {'count':>6} {'p50 ms':>7} {'p95 ms':>7} {'p99 ms':>7}\n"
+    queries = "*Queries:*\n```\n" + heading + "".join(render_latency_rows(metrics.queries)) + "```"
+    handlers = "*Handlers:*\n```\n" + heading + "".join(render_latency_rows(metrics.handlers)) + "```\n"
+    for component, stats in component_stats().items():
+        values = ", ".join(
+            f"{key} {value:.1f}" if isinstance(value, float) else f"{key} {value}"
+            for key, value in stats.items() if isinstance(value, (int, float))
+        )
+        handlers += f"\n*{component}:* `{values}`"
+    
+    await reply_messages(update, [queries, handlers])
+
 async def set_commands(app):
     """Set bot commands"""
     await app.bot.set_my_commands([
         BotCommand("start", "Start the bot"),
         BotCommand("summary", "Get sales summary"),
         BotCommand("expiring", "Check expiring products"),
-        BotCommand("renewals", "Check renewals due soon")
+        BotCommand("renewals", "Check renewals due soon"),
+        BotCommand("bulk", "Enter several sales at once")
     ])
 
-async def main():
-    """Main function"""
-    if not db_pool:
-        logger.error("Database pool not initialized. Exiting.")
-        return
-        
-    app = ApplicationBuilder().token(BOT_TOKEN).build()
-    await set_commands(app)
-
+def add_handlers(app):
+    """Register the bot's command, button and message handlers on app"""
     app.add_handler(CommandHandler("start", start))
     app.add_handler(CommandHandler("summary", summary_handler))
     app.add_handler(CommandHandler("expiring", expiring_handler))
     app.add_handler(CommandHandler("renewals", renewals_handler))
+    app.add_handler(CommandHandler("sell", sell_handler))
+    app.add_handler(CommandHandler("bulk", bulk_handler))
+    app.add_handler(CommandHandler("stats", stats_handler))
     app.add_handler(CallbackQueryHandler(button_handler))
+    app.add_handler(InlineQueryHandler(inline_query_handler))
     app.add_handler(MessageHandler(filters.TEXT & ~filters.COMMAND, text_handler))
+    app.add_handler(MessageHandler(filters.Document.FileExtension("csv"), document_handler))
+    instrument_handlers(app)
+
+async def main():
+    """Main function"""
+    try:
+        await run_in_db_executor(db_pool.warm)
+        logger.info("Database connection pool created successfully")
+    except Exception as e:
+        logger.error(f"Failed to create database pool: {e}")
+        logger.error("Database pool not initialized. Exiting.")
+        return
+        
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        .concurrent_updates(update_processor)
+        .post_init(start_metrics_server)
+        .post_stop(drain_queues)
+        .build()
+    )
+    await set_commands(app)
+    add_handlers(app)
 
     # Schedule daily notifications check at 6 AM Bangkok time
     from datetime import time as dtime
@@ -1208,8 +3527,56 @@ async def main():
         time=bangkok_6am
     )
 
-    logger.info("Bot running with auto-scheduler...")
-    await app.run_polling()
+    # The PHP sale endpoints refresh the rollup days they touch; as a safety
+    # net, rebuild it in chunks at startup and nightly, recent days every few minutes
+    app.job_queue.run_once(reconcile_sales_rollup_job, when=0, data='full')
+    app.job_queue.run_daily(
+        reconcile_sales_rollup_job,
+        time=dtime(hour=3, minute=0, tzinfo=BANGKOK_TZ),
+        data='full'
+    )
+    app.job_queue.run_repeating(
+        reconcile_sales_rollup_job,
+        interval=ROLLUP_RECONCILE_MINUTES * 60,
+        first=ROLLUP_RECONCILE_MINUTES * 60
+    )
+
+    # Pick up catalog edits made through the PHP dashboard
+    app.job_queue.run_repeating(
+        poll_cache_versions,
+        interval=CACHE_VERSION_POLL_SECONDS,
+        first=0
+    )
+
+    # Revoke cached logins soon after a bot user is deactivated or deleted
+    app.job_queue.run_repeating(
+        poll_bot_users_fingerprint,
+        interval=AUTH_REVOCATION_POLL_SECONDS,
+        first=0
+    )
+
+    if BOT_MODE == 'webhook':
+        # Telegram sends the secret in X-Telegram-Bot-Api-Secret-Token and the
+        # webhook server answers 403 to any request without it
+        if not WEBHOOK_SECRET or not re.fullmatch(r'[A-Za-z0-9_-]{1,256}', WEBHOOK_SECRET):
+            logger.error("Webhook mode needs ERAVERSE_WEBHOOK_SECRET (1-256 of A-Z, a-z, 0-9, _ and -). Exiting.")
+            return
+        if not WEBHOOK_URL:
+            logger.error("Webhook mode needs ERAVERSE_WEBHOOK_URL. Exiting.")
+            return
+        
+        logger.info(f"Bot running with auto-scheduler (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT}/{WEBHOOK_PATH})...")
+        app.run_webhook(
+            listen=WEBHOOK_LISTEN,
+            port=WEBHOOK_PORT,
+            url_path=WEBHOOK_PATH,
+            webhook_url=f"{WEBHOOK_URL.rstrip('/')}/{WEBHOOK_PATH}",
+            secret_token=WEBHOOK_SECRET,
+            allowed_updates=Update.ALL_TYPES
+        )
+    else:
+        logger.info("Bot running with auto-scheduler...")
+        app.run_polling()
 
 # ✅ Entry point
 if __name__ == '__main__':
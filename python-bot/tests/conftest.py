@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Tests import the bot module and the helpers next to them directly
+TESTS_DIR = os.path.dirname(os.path.abspath(__file__))
+BOT_DIR = os.path.dirname(TESTS_DIR)
+for path in (BOT_DIR, TESTS_DIR):
+    if path not in sys.path:
+        sys.path.insert(0, path)
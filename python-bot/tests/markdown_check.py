@@ -0,0 +1,23 @@
+"""Legacy-Markdown entity check shared by the message tests"""
+
+
+def unclosed_markdown_entity(text):
+    """Return the offset of the first unclosed legacy-Markdown entity, or None"""
+    i = 0
+    opened_at = None
+    opener = None
+    while i < len(text):
+        char = text[i]
+        if opener == '`':
+            if char == '`':
+                opener = None
+        elif char == '\\' and opener is None:
+            i += 1
+        elif opener is None and char in '*_`[':
+            opener, opened_at = char, i
+        elif opener == '[' and char == ']':
+            opener = None
+        elif char == opener:
+            opener = None
+        i += 1
+    return opened_at if opener is not None else None
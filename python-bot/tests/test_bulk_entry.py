@@ -0,0 +1,33 @@
+"""Parsing and validation of bulk sale rows"""
+import pytest
+
+import eraverse_dashboard as bot
+
+WHOLESALE_PRODUCT = {
+    'product_type': 'wholesale', 'product_name': 'Netflix', 'duration': 1, 'renew': 0,
+    'retail': 120, 'wholesale': 100,
+}
+RETAIL_PRODUCT = dict(WHOLESALE_PRODUCT, product_type='retail')
+
+
+def test_csv_wholesale_row_without_quantity_defaults_to_one():
+    content = "product_id,customer,email,manager\nWS-3,Alice,a@example.com,Bob\n"
+    [(row_number, product_id, lines, purchased_date)] = bot.parse_bulk_csv(content, '2026-10-17')
+    assert (row_number, product_id, purchased_date) == (1, 'WS-3', '2026-10-17')
+    sale = bot.build_sale_data(WHOLESALE_PRODUCT, lines, purchased_date, strict=True)
+    assert sale['quantity'] == 1
+    assert sale['price'] == 120
+
+
+@pytest.mark.parametrize("product, lines", [
+    (RETAIL_PRODUCT, ['Alice', 'a@example.com', 'Bob', 'free']),
+    (WHOLESALE_PRODUCT, ['Alice', 'a@example.com', 'Bob', '2', '1.2.3']),
+])
+def test_bulk_rejects_unparsable_price(product, lines):
+    with pytest.raises(bot.SaleInputError, match="Invalid price format"):
+        bot.build_sale_data(product, lines, '2026-10-17', strict=True)
+
+
+def test_single_sale_falls_back_to_catalog_price():
+    sale = bot.build_sale_data(RETAIL_PRODUCT, ['Alice', 'a@example.com', 'Bob', 'free'], '2026-10-17')
+    assert sale['price'] == 120
@@ -0,0 +1,24 @@
+"""Markdown checks for the /bulk instructions.
+
+Telegram's legacy Markdown rejects a message whose *, _, ` or [ entities
+are left open ("Can't find end of the entity"), so the instruction text
+must balance or the user never sees it.
+"""
+import pytest
+
+import eraverse_dashboard as bot
+from markdown_check import unclosed_markdown_entity
+
+
+@pytest.mark.parametrize("text, expected", [
+    ("*bold* and `code_with_underscore`", None),
+    ("escaped purchased\\_date", None),
+    ("bare purchased_date", 14),
+    ("*unclosed", 0),
+])
+def test_unclosed_markdown_entity(text, expected):
+    assert unclosed_markdown_entity(text) == expected
+
+
+def test_bulk_instructions_markdown_is_balanced():
+    assert unclosed_markdown_entity(bot.BULK_INSTRUCTIONS) is None
@@ -0,0 +1,34 @@
+"""Oversized list entries must still reach Telegram as valid Markdown"""
+from datetime import date
+from types import SimpleNamespace
+
+import pytest
+
+import eraverse_dashboard as bot
+from markdown_check import unclosed_markdown_entity
+
+
+def expiring_item(customer, email="someone@example.com"):
+    return SimpleNamespace(
+        display_product="Retail - Netflix", customer=customer, email=email,
+        purchased_date=date(2026, 9, 17), expired_date=date(2026, 10, 17), days_left=0,
+    )
+
+
+def test_long_fields_are_shortened_before_rendering():
+    text = bot.render_expiring_item(1, expiring_item("y" * 5000, "e_" * 3000))
+    assert bot.telegram_length(text) < bot.TELEGRAM_MESSAGE_LIMIT
+    assert unclosed_markdown_entity(text) is None
+
+
+@pytest.mark.parametrize("item", [
+    "1. Customer: `" + "y" * 5000 + "`\n",
+    "*" + "y" * 5000 + "*\n",
+    "see [" + "y" * 5000 + "](https://example.com)\n",
+])
+def test_oversized_item_is_packed_as_balanced_markdown(item):
+    messages = bot.pack_messages([item], bot.part_header("Expiring Products"))
+    assert messages
+    for message in messages:
+        assert bot.telegram_length(message) <= bot.TELEGRAM_MESSAGE_LIMIT
+        assert unclosed_markdown_entity(message) is None
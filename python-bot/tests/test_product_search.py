@@ -0,0 +1,23 @@
+"""Inline product search over the in-memory index"""
+import pytest
+
+import eraverse_dashboard as bot
+
+PRODUCTS = [
+    {'product_id': 'R-1', 'product_name': 'Netflix Premium', 'product_type': 'retail'},
+    {'product_id': 'R-2', 'product_name': 'Spotify', 'product_type': 'retail'},
+    {'product_id': 'WS-1', 'product_name': 'Netflix Basic', 'product_type': 'wholesale'},
+    {'product_id': 'WS-2', 'product_name': 'YouTube Premium', 'product_type': 'wholesale'},
+]
+
+
+@pytest.mark.parametrize("needle, expected", [
+    ("et", ['WS-1', 'R-1']),
+    ("etf", ['WS-1', 'R-1']),
+    ("pre", ['R-1', 'WS-2']),
+    ("re", ['R-1', 'WS-2']),
+    ("who", []),
+])
+def test_search_matches_substrings_of_raw_names(needle, expected):
+    index = bot.ProductSearchIndex(PRODUCTS)
+    assert [product['product_id'] for product in index.search(needle)] == expected
@@ -0,0 +1,102 @@
+"""Renewal and expiry engines against their reference implementations
+
+calculate_next_due_date is checked against the step-by-step loop it
+replaced, and the NumPy/pandas batch paths against the scalar per-row
+paths. No database is needed.
+"""
+from datetime import date, datetime, timedelta
+
+import pytest
+
+import eraverse_dashboard as bot
+
+RENEW_PERIODS = [1, 2, 3, 4, 5, 6, 7, 11, 12, 13, 24, 48]
+BASE_DATES = [
+    date(2024, 1, 31), date(2024, 2, 28), date(2024, 2, 29), date(2024, 3, 1),
+    date(2024, 4, 30), date(2024, 12, 31), date(2025, 1, 1), date(2025, 2, 28),
+    date(2025, 3, 29), date(2025, 6, 15), date(2025, 8, 31), date(2025, 9, 30),
+    date(2026, 2, 27),
+]
+
+
+def calculate_next_due_date_iterative(purchased_date, renew_months, base_date):
+    """The original loop: one renew period at a time from purchased_date"""
+    due_date = purchased_date
+    while due_date < base_date:
+        year = due_date.year
+        month = due_date.month + renew_months
+        day = due_date.day
+        while month > 12:
+            year += 1
+            month -= 12
+        try:
+            due_date = due_date.replace(year=year, month=month, day=day)
+        except ValueError:
+            if month == 12:
+                next_month = datetime(year + 1, 1, 1)
+            else:
+                next_month = datetime(year, month + 1, 1)
+            due_date = (next_month - timedelta(days=1)).date()
+    return due_date
+
+
+def purchase_days(first, last):
+    day = first
+    while day <= last:
+        yield day
+        day += timedelta(days=1)
+
+
+@pytest.mark.parametrize("renew", RENEW_PERIODS)
+def test_closed_form_matches_iterative_engine(renew):
+    for purchased in purchase_days(date(2021, 1, 1), date(2024, 3, 31)):
+        for base in BASE_DATES:
+            expected = calculate_next_due_date_iterative(purchased, renew, base)
+            assert bot.calculate_next_due_date(purchased, renew, base) == expected, (purchased, base)
+
+
+@pytest.mark.parametrize("purchased", [date(2000, 1, 31), date(2004, 2, 29), date(2019, 8, 30)])
+def test_closed_form_matches_iterative_engine_decades_later(purchased):
+    for renew in RENEW_PERIODS:
+        expected = calculate_next_due_date_iterative(purchased, renew, date(2100, 3, 1))
+        assert bot.calculate_next_due_date(purchased, renew, date(2100, 3, 1)) == expected
+
+
+def renewal_rows():
+    rows = []
+    sale_id = 0
+    for purchased in purchase_days(date(2023, 1, 1), date(2026, 2, 28)):
+        for renew, duration in ((1, 12), (2, 6), (3, 12), (6, 24), (12, 24), (0, 12), (12, 12)):
+            sale_id += 1
+            expired = purchased + timedelta(days=30 * duration)
+            rows.append(bot.SaleRow(
+                sale_id % 2, sale_id, 'Netflix', 'Alice', None,
+                purchased.isoformat() if sale_id % 3 else purchased, expired, duration, renew,
+            ))
+    return rows
+
+
+def due_summary(renewals):
+    return [(row.sale_id, row.next_due, row.days_left, row.renew) for row in renewals]
+
+
+@pytest.mark.parametrize("today", BASE_DATES)
+def test_vectorized_renewals_match_scalar_path(today):
+    rows = renewal_rows()
+    assert len(rows) >= bot.VECTORIZED_BATCH_MIN_ROWS
+    scalar = bot.process_renewal_rows(renewal_rows(), today)
+    vectorized = bot.process_renewal_rows_vectorized(rows, today)
+    assert scalar
+    assert due_summary(vectorized) == due_summary(scalar)
+
+
+def test_vectorized_expiring_matches_scalar_path():
+    today = bot.get_bangkok_today()
+    rows = [
+        bot.SaleRow(sale_id % 2, sale_id, 'Netflix', 'Alice', None, today, today + timedelta(days=offset))
+        for sale_id, offset in enumerate(range(-400, 400))
+    ]
+    scalar = sorted(bot.iter_expiring_items(rows[:], today), key=lambda row: row.days_left)
+    vectorized = bot.process_expiring_data_vectorized(rows)
+    assert scalar
+    assert [(row.sale_id, row.days_left) for row in vectorized] == [(row.sale_id, row.days_left) for row in scalar]
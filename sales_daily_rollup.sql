@@ -0,0 +1,28 @@
+-- ===============================================
+-- DAILY SALES ROLLUP FOR THE TELEGRAM BOT
+-- ===============================================
+-- Per-day totals split by retail/wholesale. The bot increments the row for
+-- each sale it saves, the PHP sale endpoints recompute the days they touch
+-- (api/sales_rollup.php), and the bot periodically rebuilds it from
+-- sale_overview and ws_sale_overview, so /summary reads one row per day
+-- instead of every sale.
+-- ===============================================
+CREATE TABLE IF NOT EXISTS sales_daily_rollup (
+    sale_date DATE NOT NULL,
+    sale_type ENUM('retail', 'wholesale') NOT NULL,
+    total_sales DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    total_profit DECIMAL(14, 2) NOT NULL DEFAULT 0,
+    order_count INT UNSIGNED NOT NULL DEFAULT 0,
+    PRIMARY KEY (sale_date, sale_type)
+);
+
+-- Initial backfill (the bot also runs a full rebuild at startup)
+REPLACE INTO sales_daily_rollup (sale_date, sale_type, total_sales, total_profit, order_count)
+SELECT purchased_date, 'retail', SUM(price), SUM(profit), COUNT(*)
+FROM sale_overview
+GROUP BY purchased_date;
+
+REPLACE INTO sales_daily_rollup (sale_date, sale_type, total_sales, total_profit, order_count)
+SELECT purchased_date, 'wholesale', SUM(price), SUM(profit), COUNT(*)
+FROM ws_sale_overview
+GROUP BY purchased_date;